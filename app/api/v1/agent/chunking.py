@@ -0,0 +1,72 @@
+from typing import List
+
+PARAGRAPH_BREAK = "\n\n"
+
+
+def _split_point(text: str, limit: int) -> int:
+    """Best place to cut `text` so the head fits in `limit` chars: paragraph, line, then word boundary."""
+    if len(text) <= limit:
+        return len(text)
+    for separator in (PARAGRAPH_BREAK, "\n", " "):
+        index = text.rfind(separator, 0, limit)
+        if index > 0:
+            return index
+    return limit
+
+
+def split_message(text: str, max_chars: int) -> List[str]:
+    """Split a reply into WhatsApp-sized messages."""
+    chunks = []
+    text = text.strip()
+    while text:
+        cut = _split_point(text, max_chars)
+        chunk = text[:cut].strip()
+        if chunk:
+            chunks.append(chunk)
+        text = text[cut:].strip()
+    return chunks
+
+
+class MessageChunker:
+    """
+    Turns a growing streamed reply into messages that can be sent before the run finishes.
+
+    The first complete paragraph is released as soon as it is available. After that, text is
+    held back and released in messages as close to `max_chars` as possible, so a long reply
+    costs as few WhatsApp messages as it would without streaming plus the early first one.
+    """
+
+    def __init__(self, max_chars: int):
+        self.max_chars = max_chars
+        self._emitted = ""
+        self._consumed = 0
+
+    def feed(self, text: str) -> List[str]:
+        """Accept the full reply streamed so far and return the messages ready to send."""
+        if not text.startswith(self._emitted):
+            # The partial output was rewritten; wait for the final text.
+            return []
+
+        chunks = []
+        if self._consumed == 0:
+            pending = text.lstrip()
+            boundary = pending.find(PARAGRAPH_BREAK)
+            if boundary > 0 and boundary <= self.max_chars:
+                self._take(text, len(text) - len(pending) + boundary, chunks)
+
+        while len(text) - self._consumed > self.max_chars:
+            cut = _split_point(text[self._consumed:], self.max_chars)
+            self._take(text, self._consumed + cut, chunks)
+
+        return chunks
+
+    def finish(self, text: str) -> List[str]:
+        """Return the messages for whatever the final reply still has unsent."""
+        return split_message(text[self._consumed:], self.max_chars)
+
+    def _take(self, text: str, end: int, chunks: List[str]) -> None:
+        chunk = text[self._consumed:end].strip()
+        if chunk:
+            chunks.append(chunk)
+        self._consumed = end
+        self._emitted = text[:end]
@@ -1,81 +1,184 @@
-from typing import List
+import json
+from typing import Any, List, Optional
 from datetime import datetime
-from sqlalchemy.orm import Session
-from sqlalchemy.orm.attributes import flag_modified
+from sqlalchemy import delete, func, select
+from sqlalchemy.ext.asyncio import AsyncSession
 from pydantic_core import to_jsonable_python
 from pydantic_ai.messages import ModelMessage, ModelMessagesTypeAdapter
 
+from core.settings import settings
 from db.schemas.conversations import Conversation
+from db.schemas.conversation_messages import ConversationMessage
 from db.schemas.carts import Cart
 
+TOOL_RETURN_STUB_CHARS = 200
 
-def get_or_create_conversation(db: Session, phone_number: str) -> Conversation:
+
+async def get_or_create_conversation(db: AsyncSession, phone_number: str) -> Conversation:
     """Get existing conversation or create new one for phone number. Also creates empty cart."""
-    conversation = db.query(Conversation).filter(
-        Conversation.phone_number == phone_number
-    ).first()
-    
+    conversation = (
+        await db.execute(select(Conversation).where(Conversation.phone_number == phone_number))
+    ).scalars().first()
+
     if not conversation:
         conversation = Conversation(phone_number=phone_number, messages=[])
         db.add(conversation)
-        
-        existing_cart = db.query(Cart).filter(Cart.phone_number == phone_number).first()
+
+        existing_cart = (
+            await db.execute(select(Cart.id).where(Cart.phone_number == phone_number))
+        ).first()
         if not existing_cart:
             now = datetime.utcnow()
             cart = Cart(phone_number=phone_number, created_at=now, updated_at=now)
             db.add(cart)
-        
-        db.commit()
-        db.refresh(conversation)
-    
+
+        await db.commit()
+    elif conversation.messages:
+        await migrate_legacy_messages(db, conversation)
+
     return conversation
 
 
-def load_message_history(conversation: Conversation, limit: int = 8) -> List[ModelMessage]:
-    """Load message history from conversation JSON."""
-    if not conversation.messages:
-        return []
-    
-    raw_messages = conversation.messages[-limit:] if len(conversation.messages) > limit else conversation.messages
-    
-    if not raw_messages:
-        return []
-    
-    # patch anthropic requires each tool_use to have its corresponding tool_result.
-    start_idx = 0
-    for i, msg in enumerate(raw_messages):
-        if msg.get("kind") == "request":
-            parts = msg.get("parts", [])
-            has_tool_return = any(p.get("kind") == "tool-return" for p in parts)
-            if not has_tool_return:
-                start_idx = i
+async def _last_seq(db: AsyncSession, conversation: Conversation) -> int:
+    return (
+        await db.execute(
+            select(func.coalesce(func.max(ConversationMessage.seq), 0))
+            .where(ConversationMessage.conversation_id == conversation.id)
+        )
+    ).scalar()
+
+
+async def _append_rows(db: AsyncSession, conversation: Conversation, serialized: List[dict]) -> None:
+    seq = await _last_seq(db, conversation)
+    db.add_all([
+        ConversationMessage(
+            conversation_id=conversation.id,
+            seq=seq + offset,
+            kind=message.get("kind", ""),
+            message=message,
+        )
+        for offset, message in enumerate(serialized, start=1)
+    ])
+
+
+async def migrate_legacy_messages(db: AsyncSession, conversation: Conversation) -> int:
+    """Move messages stored in the legacy JSON blob into conversation_messages rows."""
+    legacy = list(conversation.messages or [])
+    if legacy:
+        await _append_rows(db, conversation, legacy)
+    conversation.messages = []
+    await db.commit()
+    return len(legacy)
+
+
+def _estimate_tokens(message: dict) -> int:
+    # ~4 characters per token is close enough to budget prompts without a tokenizer.
+    return len(json.dumps(message, ensure_ascii=False, default=str)) // 4 + 1
+
+
+def _summarize_tool_return(content: Any) -> str:
+    if isinstance(content, dict) and content:
+        if "error" in content:
+            return f"error: {content['error']}"
+        key, value = next(iter(content.items()))
+        if isinstance(value, dict) and "rows" in value:
+            value = value["rows"]
+        if isinstance(value, list):
+            return f"[{len(value)} {key} returned earlier; call the tool again for current data]"
+        return f"[{key} returned earlier; call the tool again for current data]"
+    text = json.dumps(content, ensure_ascii=False, default=str)
+    return text if len(text) <= TOOL_RETURN_STUB_CHARS else text[:TOOL_RETURN_STUB_CHARS] + "..."
+
+
+def _compact(message: dict) -> dict:
+    """Replace tool-return payloads with short stubs."""
+    if message.get("kind") != "request":
+        return message
+    parts = []
+    for part in message.get("parts", []):
+        if part.get("part_kind") == "tool-return":
+            part = {**part, "content": _summarize_tool_return(part.get("content"))}
+        parts.append(part)
+    return {**message, "parts": parts}
+
+
+def _starts_turn(message: dict) -> bool:
+    return message.get("kind") == "request" and any(
+        part.get("part_kind") == "user-prompt" for part in message.get("parts", [])
+    )
+
+
+def _split_turns(messages: List[dict]) -> List[List[dict]]:
+    """Group messages into turns, each starting at a user prompt. Leading partial turns are dropped."""
+    turns = []
+    for message in messages:
+        if _starts_turn(message):
+            turns.append([message])
+        elif turns:
+            turns[-1].append(message)
+    return turns
+
+
+async def load_message_history(
+    db: AsyncSession,
+    conversation: Conversation,
+    token_budget: Optional[int] = None,
+    max_messages: Optional[int] = None,
+) -> List[ModelMessage]:
+    """
+    Load the most recent whole turns of a conversation that fit in `token_budget`.
+
+    Tool returns are only replayed verbatim for the latest turn; older ones are replaced by
+    short stubs. Turns are kept whole so every tool call keeps its tool return.
+    """
+    token_budget = token_budget or settings.history_token_budget
+    max_messages = max_messages or settings.history_max_messages
+
+    rows = (
+        await db.execute(
+            select(ConversationMessage.message)
+            .where(ConversationMessage.conversation_id == conversation.id)
+            .order_by(ConversationMessage.seq.desc())
+            .limit(max_messages)
+        )
+    ).scalars().all()
+    turns = _split_turns(list(reversed(rows)))
+
+    selected: List[List[dict]] = []
+    used = 0
+    for position, turn in enumerate(reversed(turns)):
+        compacted = [_compact(message) for message in turn]
+        candidates = (turn, compacted) if position == 0 else (compacted,)
+        for candidate in candidates:
+            cost = sum(_estimate_tokens(message) for message in candidate)
+            if used + cost <= token_budget:
                 break
-    
-    raw_messages = raw_messages[start_idx:]
-    
+        else:
+            break
+        selected.append(candidate)
+        used += cost
+
+    raw_messages = [message for turn in reversed(selected) for message in turn]
+
     if not raw_messages:
         return []
-    
+
     try:
         return ModelMessagesTypeAdapter.validate_python(raw_messages)
     except Exception:
         return []
 
 
-def save_messages(db: Session, conversation: Conversation, new_messages: List[ModelMessage]) -> None:
-    """Append new messages to conversation JSON."""
-    current = list(conversation.messages or [])
-    
-    serialized = to_jsonable_python(new_messages)
-    current.extend(serialized)
-    
-    conversation.messages = current
-    flag_modified(conversation, "messages")
-    db.commit()
+async def save_messages(db: AsyncSession, conversation: Conversation, new_messages: List[ModelMessage]) -> None:
+    """Append new messages to the conversation as rows."""
+    await _append_rows(db, conversation, to_jsonable_python(new_messages))
+    await db.commit()
 
 
-def clear_history(db: Session, conversation: Conversation) -> None:
+async def clear_history(db: AsyncSession, conversation: Conversation) -> None:
     """Clear conversation history."""
+    await db.execute(
+        delete(ConversationMessage).where(ConversationMessage.conversation_id == conversation.id)
+    )
     conversation.messages = []
-    flag_modified(conversation, "messages")
-    db.commit()
+    await db.commit()
@@ -1,29 +1,39 @@
 import httpx
+from contextlib import asynccontextmanager
 from pydantic import BaseModel, Field
 from pydantic_ai import Agent, RunContext, ModelSettings
+from pydantic_ai.messages import ModelMessage, ModelRequest, ModelResponse, TextPart, ToolCallPart, UserPromptPart
 from pydantic_ai.models.openrouter import OpenRouterModel
 from pydantic_ai.providers.openrouter import OpenRouterProvider
 from dataclasses import dataclass
-from typing import Optional, List
+from typing import AsyncIterator, Optional, List
 
+from agent.chunking import MessageChunker, split_message
 from agent.prompt import SALES_AGENT_PROMPT
+from agent.response_cache import response_cache
 from agent.tools import (
     get_categories,
     get_products,
     get_product_by_id,
+    get_products_by_ids,
+    search_products,
     get_cart,
     add_to_cart,
     update_cart,
     CartItem
 )
 from core.settings import settings
+from services.catalog_store import catalog_store
 
 
 @dataclass
 class SalesDeps:
-    http_client: httpx.AsyncClient
-    api_base_url: str
     user_phone: str
+    http_client: Optional[httpx.AsyncClient] = None
+    api_base_url: str = settings.api_base_url
+
+
+CART_MUTATING_TOOLS = {"tool_add_to_cart", "tool_update_cart"}
 
 
 class ResponseModel(BaseModel):
@@ -33,11 +43,18 @@ class ResponseModel(BaseModel):
         from_attributes = True
 
 
-model = OpenRouterModel(
-    settings.openrouter_model,
-    provider=OpenRouterProvider(api_key=settings.openrouter_apikey),
-    settings=ModelSettings(temperature=0.1)
-)
+def _build_model():
+    if settings.agent_model_mode == "offline":
+        from agent.offline import offline_model
+        return offline_model
+    return OpenRouterModel(
+        settings.openrouter_model,
+        provider=OpenRouterProvider(api_key=settings.openrouter_apikey),
+        settings=ModelSettings(temperature=0.1)
+    )
+
+
+model = _build_model()
 
 sales_agent = Agent(
     model,
@@ -61,6 +78,7 @@ async def tool_get_categories(
     Retrieve all available product categories from the database.
     
     Use this tool when the customer asks about available categories or types of products.
+    Lists may come as a table: `columns` names the values of each entry in `rows`.
     
     Args:
         skip: Number of records to skip for pagination. Default: 0
@@ -75,20 +93,63 @@ async def tool_get_products(
     skip: int = 0,
     limit: int = 100,
     category_id: Optional[int] = None,
-    is_active: Optional[bool] = True
+    is_active: Optional[bool] = True,
+    size: Optional[str] = None,
+    color: Optional[str] = None,
+    min_price: Optional[float] = None,
+    max_price: Optional[float] = None
 ) -> dict:
     """
     Retrieve products from the database with optional filtering.
     
     Use this tool when the customer wants to see available products or browse the catalog.
+    Lists may come as a table: `columns` names the values of each entry in `rows`.
     
     Args:
         skip: Number of records to skip for pagination. Default: 0
         limit: Maximum number of products to return. Default: 100
         category_id: Filter by category ID. Use None for all categories.
         is_active: Filter by active status. Default: True (only active products)
+        size: Filter by size, e.g. "M" or "XL". Use None for all sizes.
+        color: Filter by color, e.g. "Negro" or "Azul". Use None for all colors.
+        min_price: Only products costing at least this much. Use None for no minimum.
+        max_price: Only products costing at most this much. Use None for no maximum.
     """
-    return await get_products(ctx, skip, limit, category_id, is_active)
+    return await get_products(ctx, skip, limit, category_id, is_active, size, color, min_price, max_price)
+
+
+@sales_agent.tool
+async def tool_search_products(
+    ctx: RunContext[SalesDeps],
+    query: str,
+    limit: int = 10,
+    category_id: Optional[int] = None,
+    is_active: Optional[bool] = True,
+    size: Optional[str] = None,
+    color: Optional[str] = None,
+    min_price: Optional[float] = None,
+    max_price: Optional[float] = None
+) -> dict:
+    """
+    Search products by free text, best matches first.
+    
+    Use this tool when the customer describes what they want ("camperas negras talle M",
+    "zapatillas running") instead of listing the whole catalog with tool_get_products.
+    Pass a size, color or price range the customer states as filters, not only in the query.
+    Matches name and description, tolerates typos and singular/plural differences.
+    Lists may come as a table: `columns` names the values of each entry in `rows`.
+    
+    Args:
+        query: The customer's words describing the product (type, color, size, brand...)
+        limit: Maximum number of products to return. Default: 10
+        category_id: Filter by category ID. Use None for all categories.
+        is_active: Filter by active status. Default: True (only active products)
+        size: Filter by size, e.g. "M" or "XL". Use None for all sizes.
+        color: Filter by color, e.g. "Negro" or "Azul". Use None for all colors.
+        min_price: Only products costing at least this much. Use None for no minimum.
+        max_price: Only products costing at most this much. Use None for no maximum.
+    """
+    return await search_products(ctx, query, limit, category_id, is_active, size, color, min_price, max_price)
 
 
 @sales_agent.tool
@@ -108,6 +169,24 @@ async def tool_get_product_by_id(
     return await get_product_by_id(ctx, product_id)
 
 
+@sales_agent.tool
+async def tool_get_products_by_ids(
+    ctx: RunContext[SalesDeps],
+    product_ids: List[int]
+) -> dict:
+    """
+    Retrieve several products at once by their IDs.
+    
+    Use this tool instead of calling tool_get_product_by_id repeatedly when you need
+    details of more than one product. Ids that do not exist are listed in `missing_ids`.
+    The products may come as a table: `columns` names the values of each entry in `rows`.
+    
+    Args:
+        product_ids: The product IDs to retrieve (up to 100)
+    """
+    return await get_products_by_ids(ctx, product_ids)
+
+
 @sales_agent.tool
 async def tool_get_cart(ctx: RunContext[SalesDeps]) -> dict:
     """
@@ -116,6 +195,9 @@ async def tool_get_cart(ctx: RunContext[SalesDeps]) -> dict:
     Use this tool when the customer asks to see their cart, check their order,
     or before modifying existing cart items.
     
+    Each line already includes the product name, unit price, line total and stock
+    status, plus the cart total, so no product lookups are needed to summarize it.
+    
     The phone number is automatically obtained from the conversation context.
     """
     return await get_cart(ctx)
@@ -131,6 +213,7 @@ async def tool_add_to_cart(
     
     Use this tool when the customer wants to buy/purchase/add products.
     Items are added to existing cart items (quantities are summed).
+    Returns the updated cart with names, prices and totals.
     
     Args:
         items: List of items to add. Example: [{"product_id": 1, "quantity": 2}]
@@ -152,6 +235,7 @@ async def tool_update_cart(
     - Clear cart (pass empty list)
     
     IMPORTANT: This REPLACES all items, not adds.
+    Returns the updated cart with names, prices and totals.
     
     Args:
         items: Complete new list of items. Empty list = empty cart.
@@ -159,6 +243,56 @@ async def tool_update_cart(
     return await update_cart(ctx, items)
 
 
+@asynccontextmanager
+async def _sales_deps(user_phone: str) -> AsyncIterator[SalesDeps]:
+    if settings.agent_tools_transport == "http":
+        async with httpx.AsyncClient() as client:
+            yield SalesDeps(user_phone=user_phone, http_client=client, api_base_url=settings.api_base_url)
+    else:
+        yield SalesDeps(user_phone=user_phone)
+
+
+async def _cart_is_empty(db_session, user_phone: str) -> bool:
+    from fastapi import HTTPException
+    from services.carts import get_cart_by_phone
+    
+    try:
+        return not (await get_cart_by_phone(db_session, user_phone)).cart_items
+    except HTTPException:
+        return True
+
+
+async def _response_cache_key(
+    user_message: str, user_phone: str, message_history: List[ModelMessage], db_session
+) -> Optional[tuple]:
+    if not settings.response_cache_enabled or not db_session:
+        return None
+    # Stock updates leave `content_version` alone: cart reservations would otherwise bump it
+    # on every turn. Replies mentioning stock are bounded by the cache TTL instead.
+    return response_cache.key_for(
+        user_message,
+        await _cart_is_empty(db_session, user_phone),
+        bool(message_history),
+        catalog_store.content_version,
+    )
+
+
+def _cached_turn(user_message: str, response: str) -> List[ModelMessage]:
+    """History entries for a turn answered from the response cache."""
+    return [
+        ModelRequest(parts=[UserPromptPart(content=user_message)]),
+        ModelResponse(parts=[TextPart(content=response)]),
+    ]
+
+
+def _mutated_cart(messages: List[ModelMessage]) -> bool:
+    return any(
+        isinstance(part, ToolCallPart) and part.tool_name in CART_MUTATING_TOOLS
+        for message in messages if isinstance(message, ModelResponse)
+        for part in message.parts
+    )
+
+
 async def run_sales_agent(user_message: str, user_phone: str, db_session=None) -> str:
     """
     Run the sales agent with a user message and conversation memory.
@@ -166,7 +300,7 @@ async def run_sales_agent(user_message: str, user_phone: str, db_session=None) -
     Args:
         user_message: The message from the user
         user_phone: The phone number of the user (for cart association)
-        db_session: SQLAlchemy session for conversation persistence
+        db_session: SQLAlchemy async session for conversation persistence
     
     Returns:
         The agent's response as a string
@@ -177,21 +311,89 @@ async def run_sales_agent(user_message: str, user_phone: str, db_session=None) -
     conversation = None
     
     if db_session:
-        conversation = get_or_create_conversation(db_session, user_phone)
-        message_history = load_message_history(conversation)
-    
-    async with httpx.AsyncClient() as client:
-        deps = SalesDeps(
-            http_client=client,
-            api_base_url=settings.api_base_url,
-            user_phone=user_phone
-        )
+        conversation = await get_or_create_conversation(db_session, user_phone)
+        message_history = await load_message_history(db_session, conversation)
+    
+    cache_key = await _response_cache_key(user_message, user_phone, message_history, db_session)
+    cached = response_cache.get(cache_key) if cache_key else None
+    if cached is not None:
+        if conversation:
+            await save_messages(db_session, conversation, _cached_turn(user_message, cached))
+        return ResponseModel(response=cached)
+    
+    if db_session:
+        # Don't hold a pooled connection idle in a transaction while the model runs.
+        await db_session.commit()
+    
+    async with _sales_deps(user_phone) as deps:
         result = await sales_agent.run(
             user_message,
             deps=deps,
             message_history=message_history
         )
         
+        new_messages = result.new_messages()
+        if cache_key and not _mutated_cart(new_messages):
+            response_cache.set(cache_key, result.output.response)
+        
         if db_session and conversation:
-            save_messages(db_session, conversation, result.new_messages())
+            await save_messages(db_session, conversation, new_messages)
         return result.output
+
+
+async def stream_sales_agent(user_message: str, user_phone: str, db_session=None) -> AsyncIterator[str]:
+    """
+    Run the sales agent in streaming mode, yielding WhatsApp-sized messages as they become ready.
+    
+    The first complete paragraph is yielded while the model is still writing; the rest follows
+    in messages of at most `settings.whatsapp_max_chars` characters.
+    
+    Args:
+        user_message: The message from the user
+        user_phone: The phone number of the user (for cart association)
+        db_session: SQLAlchemy async session for conversation persistence
+    """
+    from agent.history import get_or_create_conversation, load_message_history, save_messages
+    
+    message_history = []
+    conversation = None
+    
+    if db_session:
+        conversation = await get_or_create_conversation(db_session, user_phone)
+        message_history = await load_message_history(db_session, conversation)
+    
+    cache_key = await _response_cache_key(user_message, user_phone, message_history, db_session)
+    cached = response_cache.get(cache_key) if cache_key else None
+    if cached is not None:
+        for chunk in split_message(cached, settings.whatsapp_max_chars):
+            yield chunk
+        if conversation:
+            await save_messages(db_session, conversation, _cached_turn(user_message, cached))
+        return
+    
+    if db_session:
+        await db_session.commit()
+    
+    chunker = MessageChunker(settings.whatsapp_max_chars)
+    
+    async with _sales_deps(user_phone) as deps:
+        async with sales_agent.run_stream(
+            user_message,
+            deps=deps,
+            message_history=message_history
+        ) as result:
+            async for partial in result.stream_output(debounce_by=settings.agent_stream_debounce_seconds):
+                for chunk in chunker.feed(getattr(partial, "response", None) or ""):
+                    yield chunk
+            
+            output = await result.get_output()
+            new_messages = result.new_messages()
+        
+        for chunk in chunker.finish(output.response):
+            yield chunk
+        
+        if cache_key and not _mutated_cart(new_messages):
+            response_cache.set(cache_key, output.response)
+        
+        if db_session and conversation:
+            await save_messages(db_session, conversation, new_messages)
@@ -0,0 +1,93 @@
+"""
+Deterministic stand-in for the LLM, selected with AGENT_MODEL_MODE=offline.
+
+It answers every user message with one scripted tool call picked from keywords in the message,
+then turns the tool result into a short reply. It never calls the network, so the whole chat
+pipeline can be exercised and load tested for free.
+"""
+import asyncio
+import json
+import re
+from typing import AsyncIterator, List, Union
+
+from pydantic_ai.messages import (
+    ModelMessage,
+    ModelRequest,
+    ModelResponse,
+    TextPart,
+    ToolCallPart,
+    ToolReturnPart,
+    UserPromptPart,
+)
+from pydantic_ai.models.function import AgentInfo, DeltaToolCall, DeltaToolCalls, FunctionModel
+
+from core.settings import settings
+
+STREAM_CHUNK_CHARS = 40
+
+
+def _script_tool_call(message: str) -> ToolCallPart:
+    text = message.lower()
+    number = re.search(r"\d+", text)
+    if "carrito" in text or "cart" in text:
+        return ToolCallPart("tool_get_cart", {})
+    if any(word in text for word in ("quiero", "comprar", "agregar", "buy", "add")):
+        product_id = int(number.group()) if number else 1
+        return ToolCallPart("tool_add_to_cart", {"items": [{"product_id": product_id, "quantity": 1}]})
+    if any(word in text for word in ("busco", "buscar", "tienen", "search")):
+        return ToolCallPart("tool_search_products", {"query": message, "limit": 10})
+    if "categor" in text:
+        return ToolCallPart("tool_get_categories", {})
+    return ToolCallPart("tool_get_products", {"limit": 10})
+
+
+def _summarize(tool_returns: List[ToolReturnPart]) -> str:
+    lines = []
+    for tool_return in tool_returns:
+        content = tool_return.content
+        if isinstance(content, dict) and "error" in content:
+            lines.append(f"No pude completar {tool_return.tool_name}: {content['error']}")
+            continue
+        key, value = next(iter(content.items())) if isinstance(content, dict) and content else ("result", content)
+        if isinstance(value, dict) and "rows" in value:
+            value = value["rows"]
+        count = len(value) if isinstance(value, list) else 1
+        lines.append(f"Resultado de {tool_return.tool_name}: {count} {key}.")
+    lines.append("¿Te ayudo con algo mas?")
+    return "\n\n".join(lines)
+
+
+def _next_step(messages: List[ModelMessage], info: AgentInfo) -> Union[ToolCallPart, TextPart]:
+    last = messages[-1]
+    tool_returns = [part for part in last.parts if isinstance(part, ToolReturnPart)] if isinstance(last, ModelRequest) else []
+
+    if not tool_returns:
+        prompts = [part.content for part in last.parts if isinstance(part, UserPromptPart)]
+        return _script_tool_call(str(prompts[-1]) if prompts else "")
+
+    reply = _summarize(tool_returns)
+    if info.output_tools:
+        return ToolCallPart(info.output_tools[0].name, {"response": reply})
+    return TextPart(reply)
+
+
+async def _respond(messages: List[ModelMessage], info: AgentInfo) -> ModelResponse:
+    await asyncio.sleep(settings.offline_model_latency_seconds)
+    return ModelResponse(parts=[_next_step(messages, info)])
+
+
+async def _stream(messages: List[ModelMessage], info: AgentInfo) -> AsyncIterator[Union[str, DeltaToolCalls]]:
+    await asyncio.sleep(settings.offline_model_latency_seconds)
+    step = _next_step(messages, info)
+    if isinstance(step, TextPart):
+        for start in range(0, len(step.content), STREAM_CHUNK_CHARS):
+            yield step.content[start:start + STREAM_CHUNK_CHARS]
+        return
+
+    args = json.dumps(step.args, ensure_ascii=False)
+    yield {0: DeltaToolCall(name=step.tool_name)}
+    for start in range(0, len(args), STREAM_CHUNK_CHARS):
+        yield {0: DeltaToolCall(json_args=args[start:start + STREAM_CHUNK_CHARS])}
+
+
+offline_model = FunctionModel(_respond, stream_function=_stream, model_name="offline")
@@ -0,0 +1,85 @@
+import re
+import unicodedata
+from typing import Hashable, Optional
+
+from core.cache import TTLCache
+from core.settings import settings
+
+SPANISH_HINTS = {
+    "hola", "que", "qué", "tienen", "tienes", "tenes", "los", "las", "de", "del", "productos",
+    "categorias", "categorías", "cuales", "cuáles", "ver", "quiero", "hay", "precio", "precios",
+    "buenas", "buenos", "dias", "días", "gracias", "por", "favor",
+}
+ENGLISH_HINTS = {
+    "hi", "hello", "what", "do", "you", "have", "the", "show", "products", "categories",
+    "which", "price", "prices", "see", "list", "thanks", "please",
+}
+
+# Anything that may change the cart has to go through the agent.
+CART_INTENT = re.compile(
+    r"\b(compr\w*|agreg\w*|añad\w*|anad\w*|sum\w*|quit\w*|sac\w*|elimin\w*|borr\w*|carrito|"
+    r"quiero|llevo|pedido|buy|add|remove|delete|cart|take|order|checkout)\b"
+    r"|\d",
+    re.IGNORECASE,
+)
+
+
+def normalize_message(message: str) -> str:
+    """Lowercase, strip accents and punctuation, and collapse whitespace."""
+    text = unicodedata.normalize("NFKD", message.lower())
+    text = "".join(char for char in text if not unicodedata.combining(char))
+    text = re.sub(r"[^\w\s]", " ", text)
+    return " ".join(text.split())
+
+
+def detect_language(message: str) -> str:
+    if re.search(r"[ñ¿¡áéíóú]", message.lower()):
+        return "es"
+    words = set(re.findall(r"\w+", message.lower()))
+    return "en" if len(words & ENGLISH_HINTS) > len(words & SPANISH_HINTS) else "es"
+
+
+def has_cart_intent(message: str) -> bool:
+    return bool(CART_INTENT.search(message))
+
+
+class ResponseCache:
+    """
+    Caches whole agent replies to repeated catalog questions such as "qué tienen".
+
+    Only opening turns from customers with an empty cart and no cart-changing intent are
+    eligible, since their answer depends only on the question, its language and the catalog.
+    Later turns ("si", "y en rojo?") only make sense with the conversation before them.
+    """
+
+    def __init__(self, maxsize: int, ttl: float):
+        self._cache = TTLCache(maxsize=maxsize, ttl=ttl)
+        self.bypassed = 0
+
+    def key_for(
+        self, message: str, cart_is_empty: bool, has_history: bool, catalog_version: Hashable
+    ) -> Optional[tuple]:
+        """
+        Return the cache key for an eligible turn, or None if the agent has to run.
+        `catalog_version` identifies the catalog content the reply was built from.
+        """
+        normalized = normalize_message(message)
+        if has_history or not cart_is_empty or not normalized or has_cart_intent(message):
+            self.bypassed += 1
+            return None
+        return normalized, detect_language(message), catalog_version
+
+    def get(self, key: tuple) -> Optional[str]:
+        return self._cache.get(key)
+
+    def set(self, key: tuple, response: str) -> None:
+        self._cache.set(key, response)
+
+    def stats(self) -> dict:
+        return {**self._cache.stats(), "bypassed": self.bypassed}
+
+
+response_cache = ResponseCache(
+    maxsize=settings.response_cache_max_entries,
+    ttl=settings.response_cache_ttl_seconds,
+)
@@ -1,21 +1,212 @@
-from typing import Optional, List
-from pydantic import BaseModel
+from typing import Any, Callable, Optional, List
+from fastapi import HTTPException
+from pydantic import BaseModel, ValidationError
 from pydantic_ai import RunContext
 
+from core.cache import TTLCache, catalog_cache
+from core.settings import settings
+from db.con import SessionLocal
+from models.carts import CartItemOperation, CartItemsPatch, CartView
+from services import carts as cart_service
+from services import categories as category_service
+from services import products as product_service
+from services.catalog_store import catalog_store
+
 
 class CartItem(BaseModel):
     product_id: int
     quantity: int
 
 
+# Fields the agent needs to present products; timestamps and the nested category only cost tokens.
+AGENT_PRODUCT_FIELDS = ("id", "name", "description", "size", "color", "price", "stock")
+AGENT_CATEGORY_FIELDS = ("id", "name")
+
+def _dump_cart(cart: CartView) -> dict:
+    return cart.model_dump(mode="json")
+
+
+def _dump_categories(categories: list) -> list:
+    return [{"id": category.id, "name": category.name} for category in categories]
+
+
+def _dump_products(products: list) -> list:
+    return [product_service.project_product(product, set(AGENT_PRODUCT_FIELDS)) for product in products]
+
+
+def _dump_product(product: Any) -> dict:
+    return product_service.project_product(product, set(AGENT_PRODUCT_FIELDS))
+
+
+def _select(records: list, fields: tuple) -> list:
+    return [{field: record.get(field) for field in fields} for record in records]
+
+
+def _encode_records(records: list, fields: tuple) -> Any:
+    """Encode records as a header + rows table when the compact tool output is enabled."""
+    if settings.agent_tool_output_format != "table":
+        return records
+    return {
+        "columns": list(fields),
+        "rows": [[record.get(field) for field in fields] for record in records],
+    }
+
+
+def _attribute_params(
+    size: Optional[str],
+    color: Optional[str],
+    min_price: Optional[float],
+    max_price: Optional[float]
+) -> dict:
+    params = {"size": size, "color": color, "min_price": min_price, "max_price": max_price}
+    return {name: value for name, value in params.items() if value is not None}
+
+
+def _uses_http(ctx: RunContext) -> bool:
+    return ctx.deps.http_client is not None
+
+
+async def _run_local(fn: Callable, serialize: Callable[[Any], Any], *args: Any) -> Any:
+    """Call a service function with its own session and serialize the result."""
+    async with SessionLocal() as db:
+        return serialize(await fn(db, *args))
+
+
+# Last ETag and body of each catalog URL, so reads after a catalog cache expiry are
+# revalidated with If-None-Match and usually answered by an empty 304.
+_revalidation_cache = TTLCache(maxsize=settings.catalog_cache_max_entries, ttl=24 * 3600)
+
+
+async def _get_catalog(ctx: RunContext, path: str, params: Optional[dict] = None) -> Any:
+    url = f"{ctx.deps.api_base_url}{path}"
+    key = (url, tuple(sorted((params or {}).items())))
+    cached = _revalidation_cache.get(key)
+
+    response = await ctx.deps.http_client.get(
+        url, params=params, headers={"If-None-Match": cached[0]} if cached else None
+    )
+    if response.status_code == 304 and cached:
+        return cached[1]
+    if response.status_code == 404:
+        raise HTTPException(status_code=404, detail=response.json().get("detail", "Not found"))
+    response.raise_for_status()
+
+    body = response.json()
+    if "ETag" in response.headers:
+        _revalidation_cache.set(key, (response.headers["ETag"], body))
+    return body
+
+
+def _category_tags(categories: list) -> List[str]:
+    return ["catalog"]
+
+
+def _product_tags(value: Any) -> List[str]:
+    products = value if isinstance(value, list) else [value]
+    return ["catalog", *(f"product:{product['id']}" for product in products)]
+
+
+async def _fetch_categories(ctx: RunContext, skip: int, limit: int) -> list:
+    if not _uses_http(ctx):
+        if catalog_store.ready:
+            return _select(catalog_store.list_categories(skip, limit), AGENT_CATEGORY_FIELDS)
+        return await _run_local(category_service.list_categories, _dump_categories, skip, limit)
+
+    categories = await _get_catalog(ctx, "/categories", {"skip": skip, "limit": limit})
+    return _select(categories, AGENT_CATEGORY_FIELDS)
+
+
+async def _fetch_products(
+    ctx: RunContext,
+    skip: int,
+    limit: int,
+    category_id: Optional[int],
+    is_active: Optional[bool],
+    attributes: tuple
+) -> list:
+    if not _uses_http(ctx):
+        if catalog_store.ready:
+            products = catalog_store.list_products(skip, limit, category_id, is_active, None, *attributes)
+            return _select(products, AGENT_PRODUCT_FIELDS)
+        return await _run_local(
+            product_service.list_product_rows, _dump_products,
+            skip, limit, category_id, is_active, None, set(AGENT_PRODUCT_FIELDS), *attributes,
+        )
+
+    params = {"skip": skip, "limit": limit, "fields": ",".join(AGENT_PRODUCT_FIELDS)}
+    params.update(_attribute_params(*attributes))
+    if category_id is not None:
+        params["category_id"] = category_id
+    if is_active is not None:
+        params["is_active"] = is_active
+
+    return await _get_catalog(ctx, "/products", params)
+
+
+async def _fetch_product(ctx: RunContext, product_id: int) -> dict:
+    if not _uses_http(ctx):
+        if catalog_store.ready:
+            product = catalog_store.get_product(product_id)
+            if product is None:
+                raise HTTPException(status_code=404, detail=f"Product with id {product_id} not found")
+            return _select([product], AGENT_PRODUCT_FIELDS)[0]
+        return await _run_local(product_service.get_product, _dump_product, product_id, False)
+
+    return await _get_catalog(ctx, f"/products/{product_id}", {"fields": ",".join(AGENT_PRODUCT_FIELDS)})
+
+
+async def _fetch_products_by_ids(ctx: RunContext, product_ids: List[int]) -> tuple[list, list]:
+    if not _uses_http(ctx):
+        if catalog_store.ready:
+            products, missing = catalog_store.get_products(product_ids)
+            return _select(products, AGENT_PRODUCT_FIELDS), missing
+        return await _run_local(
+            product_service.get_products_by_ids,
+            lambda result: (_dump_products(result[0]), result[1]),
+            product_ids,
+            False,
+        )
+
+    body = await _get_catalog(
+        ctx, "/products/batch", {"ids": ",".join(map(str, product_ids)), "fields": ",".join(AGENT_PRODUCT_FIELDS)}
+    )
+    return body["products"], body["missing_ids"]
+
+
+async def _search_products(
+    ctx: RunContext,
+    query: str,
+    limit: int,
+    category_id: Optional[int],
+    is_active: Optional[bool],
+    attributes: tuple
+) -> list:
+    if not _uses_http(ctx):
+        return await _run_local(
+            product_service.search_product_rows, _dump_products,
+            query, 0, limit, category_id, is_active, set(AGENT_PRODUCT_FIELDS), *attributes,
+        )
+
+    params = {"q": query, "limit": limit, "fields": ",".join(AGENT_PRODUCT_FIELDS)}
+    params.update(_attribute_params(*attributes))
+    if category_id is not None:
+        params["category_id"] = category_id
+    if is_active is not None:
+        params["is_active"] = is_active
+
+    return await _get_catalog(ctx, "/products/search", params)
+
+
 async def get_categories(ctx: RunContext, skip: int = 0, limit: int = 100) -> dict:
     try:
-        response = await ctx.deps.http_client.get(
-            f"{ctx.deps.api_base_url}/categories",
-            params={"skip": skip, "limit": limit}
+        categories = await catalog_cache.get_or_set(
+            ("categories", skip, limit),
+            lambda: _fetch_categories(ctx, skip, limit),
+            tags=_category_tags,
         )
-        response.raise_for_status()
-        return {"categories": response.json()}
+        return {"categories": _encode_records(categories, AGENT_CATEGORY_FIELDS)}
+    except HTTPException as e:
+        return {"error": e.detail}
     except Exception as e:
         return {"error": str(e)}
 
@@ -25,108 +216,140 @@ async def get_products(
     skip: int = 0,
     limit: int = 100,
     category_id: Optional[int] = None,
-    is_active: Optional[bool] = True
+    is_active: Optional[bool] = True,
+    size: Optional[str] = None,
+    color: Optional[str] = None,
+    min_price: Optional[float] = None,
+    max_price: Optional[float] = None
 ) -> dict:
     try:
-        params = {"skip": skip, "limit": limit}
-        if category_id is not None:
-            params["category_id"] = category_id
-        if is_active is not None:
-            params["is_active"] = is_active
-            
-        response = await ctx.deps.http_client.get(
-            f"{ctx.deps.api_base_url}/products",
-            params=params
+        attributes = (size, color, min_price, max_price)
+        products = await catalog_cache.get_or_set(
+            ("products", skip, limit, category_id, is_active, attributes),
+            lambda: _fetch_products(ctx, skip, limit, category_id, is_active, attributes),
+            tags=_product_tags,
         )
-        response.raise_for_status()
-        return {"products": response.json()}
+        return {"products": _encode_records(products, AGENT_PRODUCT_FIELDS)}
+    except HTTPException as e:
+        return {"error": e.detail}
     except Exception as e:
         return {"error": str(e)}
 
 
-async def get_product_by_id(ctx: RunContext, product_id: int) -> dict:
+async def search_products(
+    ctx: RunContext,
+    query: str,
+    limit: int = 10,
+    category_id: Optional[int] = None,
+    is_active: Optional[bool] = True,
+    size: Optional[str] = None,
+    color: Optional[str] = None,
+    min_price: Optional[float] = None,
+    max_price: Optional[float] = None
+) -> dict:
     try:
-        response = await ctx.deps.http_client.get(
-            f"{ctx.deps.api_base_url}/products/{product_id}"
+        attributes = (size, color, min_price, max_price)
+        products = await catalog_cache.get_or_set(
+            ("search", " ".join(query.lower().split()), limit, category_id, is_active, attributes),
+            lambda: _search_products(ctx, query, limit, category_id, is_active, attributes),
+            tags=_product_tags,
         )
-        if response.status_code == 404:
-            return {"error": f"Product with id {product_id} not found"}
-        response.raise_for_status()
-        return {"product": response.json()}
+        return {"products": _encode_records(products, AGENT_PRODUCT_FIELDS)}
+    except HTTPException as e:
+        return {"error": e.detail}
     except Exception as e:
         return {"error": str(e)}
 
 
-async def get_cart(ctx: RunContext) -> dict:
+async def get_product_by_id(ctx: RunContext, product_id: int) -> dict:
     try:
-        response = await ctx.deps.http_client.get(
-            f"{ctx.deps.api_base_url}/carts/phone/{ctx.deps.user_phone}"
+        product = await catalog_cache.get_or_set(
+            ("product", product_id),
+            lambda: _fetch_product(ctx, product_id),
+            tags=_product_tags,
         )
-        response.raise_for_status()
-        return {"cart": response.json()}
+        return {"product": product}
+    except HTTPException as e:
+        return {"error": e.detail}
     except Exception as e:
         return {"error": str(e)}
 
 
-async def add_to_cart(ctx: RunContext, items: List[CartItem]) -> dict:
+async def get_products_by_ids(ctx: RunContext, product_ids: List[int]) -> dict:
     try:
-        cart_response = await ctx.deps.http_client.get(
-            f"{ctx.deps.api_base_url}/carts/phone/{ctx.deps.user_phone}"
-        )
-        if cart_response.status_code != 200:
-            return {"error": "Could not find cart"}
-        
-        cart = cart_response.json()
-        cart_id = cart["id"]
-        
-        existing_items = {item["product_id"]: item["quantity"] for item in cart.get("cart_items", [])}
-        
-        for item in items:
-            if item.product_id in existing_items:
-                existing_items[item.product_id] += item.quantity
-            else:
-                existing_items[item.product_id] = item.quantity
-        
-        payload = {
-            "items": [{"product_id": pid, "quantity": qty} for pid, qty in existing_items.items() if qty > 0]
+        product_ids = list(dict.fromkeys(product_ids))[:product_service.MAX_BATCH_IDS]
+        # Single products are cached per id, so only the ids not already cached are fetched.
+        cached = {product_id: catalog_cache.get(("product", product_id)) for product_id in product_ids}
+        missing = []
+        to_fetch = [product_id for product_id, product in cached.items() if product is None]
+        if to_fetch:
+            fetched, missing = await _fetch_products_by_ids(ctx, to_fetch)
+            for product in fetched:
+                catalog_cache.set(("product", product["id"]), product, _product_tags(product))
+                cached[product["id"]] = product
+
+        products = [cached[product_id] for product_id in product_ids if cached[product_id] is not None]
+        return {
+            "products": _encode_records(products, AGENT_PRODUCT_FIELDS),
+            "missing_ids": missing,
         }
-        
-        response = await ctx.deps.http_client.put(
-            f"{ctx.deps.api_base_url}/carts/{cart_id}",
-            json=payload
+    except HTTPException as e:
+        return {"error": e.detail}
+    except Exception as e:
+        return {"error": str(e)}
+
+
+async def get_cart(ctx: RunContext) -> dict:
+    try:
+        if not _uses_http(ctx):
+            cart = await _run_local(cart_service.get_cart_view_by_phone, _dump_cart, ctx.deps.user_phone)
+            return {"cart": cart}
+
+        response = await ctx.deps.http_client.get(
+            f"{ctx.deps.api_base_url}/carts/phone/{ctx.deps.user_phone}/view"
         )
-        if response.status_code == 400:
-            return {"error": response.json().get("detail", "Bad request")}
-        if response.status_code == 404:
-            return {"error": response.json().get("detail", "Product not found")}
         response.raise_for_status()
         return {"cart": response.json()}
+    except HTTPException as e:
+        return {"error": e.detail}
     except Exception as e:
         return {"error": str(e)}
 
 
-async def update_cart(ctx: RunContext, items: List[CartItem]) -> dict:
+async def _patch_cart(ctx: RunContext, build_patch: Callable[[], CartItemsPatch]) -> dict:
+    """
+    Apply cart item operations in a single call and transaction. The patch is built inside the
+    error handling, so invalid quantities from the model come back as a tool error.
+    """
     try:
-        cart_response = await ctx.deps.http_client.get(
-            f"{ctx.deps.api_base_url}/carts/phone/{ctx.deps.user_phone}"
-        )
-        if cart_response.status_code != 200:
-            return {"error": "Could not find cart"}
-        
-        cart_id = cart_response.json()["id"]
-        
-        payload = {
-            "items": [{"product_id": item.product_id, "quantity": item.quantity} for item in items]
-        }
-        response = await ctx.deps.http_client.put(
-            f"{ctx.deps.api_base_url}/carts/{cart_id}",
-            json=payload
+        patch = build_patch()
+        if not _uses_http(ctx):
+            cart = await _run_local(cart_service.patch_items_by_phone, _dump_cart, ctx.deps.user_phone, patch)
+            return {"cart": cart}
+
+        response = await ctx.deps.http_client.patch(
+            f"{ctx.deps.api_base_url}/carts/phone/{ctx.deps.user_phone}/items",
+            json=patch.model_dump(),
         )
-        if response.status_code == 404:
-            return {"error": response.json().get("detail", "Cart not found")}
-        if response.status_code == 400:
+        if response.status_code in (400, 404, 422):
             return {"error": response.json().get("detail", "Bad request")}
         response.raise_for_status()
         return {"cart": response.json()}
+    except ValidationError as e:
+        return {"error": "; ".join(error["msg"] for error in e.errors())}
+    except HTTPException as e:
+        return {"error": e.detail}
     except Exception as e:
         return {"error": str(e)}
+
+
+async def add_to_cart(ctx: RunContext, items: List[CartItem]) -> dict:
+    return await _patch_cart(ctx, lambda: CartItemsPatch(items=[
+        CartItemOperation(op="add", product_id=item.product_id, quantity=item.quantity) for item in items
+    ]))
+
+
+async def update_cart(ctx: RunContext, items: List[CartItem]) -> dict:
+    return await _patch_cart(ctx, lambda: CartItemsPatch(replace=True, items=[
+        CartItemOperation(op="set", product_id=item.product_id, quantity=item.quantity) for item in items
+    ]))
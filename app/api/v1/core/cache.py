@@ -0,0 +1,91 @@
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Hashable, Iterable, Optional
+
+from core.settings import settings
+
+
+class TTLCache:
+    """Thread-safe LRU cache whose entries expire after a TTL and can be invalidated by tag."""
+
+    def __init__(self, maxsize: int, ttl: float):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries: OrderedDict[Hashable, tuple[float, Any, frozenset]] = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[0] < time.monotonic():
+                if entry is not None:
+                    del self._entries[key]
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+
+    def set(self, key: Hashable, value: Any, tags: Iterable[str] = ()) -> None:
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, value, frozenset(tags))
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    async def get_or_set(
+        self,
+        key: Hashable,
+        loader: Callable[[], Awaitable[Any]],
+        tags: Callable[[Any], Iterable[str]] = lambda value: (),
+    ) -> Any:
+        value = self.get(key)
+        if value is None:
+            value = await loader()
+            self.set(key, value, tags(value))
+        return value
+
+    def invalidate(self, *tags: str) -> int:
+        """Drop every entry carrying any of the given tags. Returns the number of dropped entries."""
+        wanted = set(tags)
+        with self._lock:
+            stale = [key for key, entry in self._entries.items() if entry[2] & wanted]
+            for key in stale:
+                del self._entries[key]
+            self.invalidations += len(stale)
+        return len(stale)
+
+    def clear(self) -> None:
+        with self._lock:
+            self.invalidations += len(self._entries)
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "maxsize": self.maxsize,
+                "ttl_seconds": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+            }
+
+
+catalog_cache = TTLCache(
+    maxsize=settings.catalog_cache_max_entries,
+    ttl=settings.catalog_cache_ttl_seconds,
+)
+
+def invalidate_products(product_ids: Iterable[int]) -> None:
+    """Drop cached catalog reads that include any of the given products."""
+    catalog_cache.invalidate(*(f"product:{product_id}" for product_id in product_ids))
@@ -0,0 +1,71 @@
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Deque, Dict, Iterator
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+
+def _percentile(samples: list, fraction: float) -> float:
+    index = min(len(samples) - 1, int(round(fraction * (len(samples) - 1))))
+    return samples[index]
+
+
+class StageLatencies:
+    """Keeps the last `maxlen` durations of each pipeline stage and reports percentiles."""
+
+    def __init__(self, maxlen: int = 10000):
+        self._maxlen = maxlen
+        self._samples: Dict[str, Deque[float]] = {}
+        self._lock = threading.Lock()
+
+    def record(self, stage: str, seconds: float) -> None:
+        with self._lock:
+            self._samples.setdefault(stage, deque(maxlen=self._maxlen)).append(seconds)
+
+    @contextmanager
+    def timer(self, stage: str) -> Iterator[None]:
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(stage, time.perf_counter() - start)
+
+    def reset(self) -> None:
+        with self._lock:
+            self._samples.clear()
+
+    def summary(self) -> dict:
+        with self._lock:
+            snapshot = {stage: sorted(samples) for stage, samples in self._samples.items()}
+        return {
+            stage: {
+                "count": len(samples),
+                "p50_ms": round(_percentile(samples, 0.50) * 1000, 2),
+                "p90_ms": round(_percentile(samples, 0.90) * 1000, 2),
+                "p99_ms": round(_percentile(samples, 0.99) * 1000, 2),
+                "max_ms": round(samples[-1] * 1000, 2),
+            }
+            for stage, samples in snapshot.items() if samples
+        }
+
+
+class QueryCounter:
+    """Counts SQL statements executed through an engine."""
+
+    def __init__(self):
+        self.count = 0
+        self._lock = threading.Lock()
+
+    def attach(self, engine: Engine) -> "QueryCounter":
+        event.listen(engine, "before_cursor_execute", self._on_execute)
+        return self
+
+    def _on_execute(self, *args) -> None:
+        with self._lock:
+            self.count += 1
+
+
+stage_latencies = StageLatencies()
@@ -1,3 +1,4 @@
+from typing import Literal
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
 
@@ -10,18 +11,75 @@ class Settings(BaseSettings):
     db_port: int
     db_name: str
 
+    db_pool_size: int = 10
+    db_max_overflow: int = 20
+
     @property
     def database_url(self) -> str:
-        return f"postgresql+psycopg2://{self.db_user}:{self.db_password}@{self.db_host}:{self.db_port}/{self.db_name}?sslmode=require"
+        return f"postgresql+asyncpg://{self.db_user}:{self.db_password}@{self.db_host}:{self.db_port}/{self.db_name}?ssl=require"
 
     openrouter_apikey: str
     openrouter_api_url: str = "https://openrouter.ai/api/v1"
     openrouter_model: str = "google/gemini-3-flash-preview"
+    # "offline" swaps the LLM for a scripted, network-free model (agent/offline.py) for load tests
+    agent_model_mode: Literal["openrouter", "offline"] = "openrouter"
+    offline_model_latency_seconds: float = 0.0
     
     api_base_url: str = "http://localhost:8000/api/v1"
+    # "local" calls the service layer in-process, "http" goes through api_base_url (split deployments)
+    agent_tools_transport: Literal["local", "http"] = "local"
+    # "table" sends catalog lists to the model as columns + rows instead of one JSON object per record
+    agent_tool_output_format: Literal["table", "json"] = "table"
+
+    catalog_cache_ttl_seconds: float = 60.0
+    catalog_cache_max_entries: int = 512
+
+    # Serve catalog reads from an in-process copy kept fresh by Postgres NOTIFY (the listener
+    # runs either way, to invalidate cached catalog reads on changes from other processes)
+    catalog_store_enabled: bool = True
+    catalog_store_debounce_seconds: float = 0.05
+    
+    # Send the first paragraph of a reply while the model is still generating the rest
+    agent_streaming: bool = False
+    agent_stream_debounce_seconds: float = 0.1
+    whatsapp_max_chars: int = 1500
+    # Conversation history replayed to the model: whole turns, newest first, until the budget is spent
+    history_token_budget: int = 4000
+    history_max_messages: int = 40
+    # Opt-in cache of whole replies to repeated catalog questions from customers with an empty cart
+    response_cache_enabled: bool = False
+    response_cache_max_entries: int = 1024
+    response_cache_ttl_seconds: float = 300.0
+    # Messages from the same phone arriving within this window are answered in a single agent run.
+    # In-memory turns start at once and only wait this long after a previous turn of the phone.
+    chat_coalesce_window_seconds: float = 0.2
+    # Per-phone Postgres advisory lock around each agent turn, safe across workers, processes and hosts
+    conversation_locking: bool = True
+    conversation_lock_timeout_seconds: float = 120.0
+    conversation_lock_poll_seconds: float = 0.1
+    conversation_lock_pool_size: int = 20
+    # Twilio MessageSids already accepted: a bounded in-memory set in front of the message_receipts table
+    webhook_dedupe_cache_size: int = 10000
+    webhook_receipt_retention_hours: float = 72.0
+    # "postgres" stores inbound messages in inbound_jobs before acknowledging the webhook and
+    # processes them with a worker pool (in the API process and/or `python jobs/worker.py`)
+    inbound_queue: Literal["memory", "postgres"] = "memory"
+    job_workers: int = 4
+    job_workers_in_api: bool = True
+    job_lease_seconds: float = 300.0
+    job_max_attempts: int = 3
+    job_retry_backoff_seconds: float = 5.0
+    job_poll_interval_seconds: float = 0.5
+    job_retention_hours: float = 72.0
     
     twilio_account_sid: str
     twilio_auth_token: str
     twilio_phone_number: str
+    # "fake" records outbound WhatsApp messages in memory instead of calling Twilio
+    whatsapp_sender: Literal["twilio", "fake"] = "twilio"
+    # Outbound delivery: concurrent Twilio requests, and retries with exponential backoff on 429/5xx
+    whatsapp_send_concurrency: int = 8
+    whatsapp_send_max_retries: int = 4
+    whatsapp_send_backoff_seconds: float = 0.5
 
 settings = Settings()
@@ -0,0 +1,77 @@
+import asyncio
+import logging
+from contextlib import asynccontextmanager
+from typing import AsyncIterator
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncConnection, create_async_engine
+
+from core.settings import settings
+
+logger = logging.getLogger(__name__)
+
+# First key of the two-int advisory lock, so conversation locks never collide with other users
+# of pg_advisory_lock (the job queue claims use a single-key transaction lock).
+CONVERSATION_LOCK_NAMESPACE = 7001
+
+# Session-level advisory locks live on the connection that took them, which stays checked out
+# for the whole agent turn. A dedicated pool keeps those connections from starving request handlers.
+lock_engine = create_async_engine(
+    settings.database_url,
+    pool_size=settings.conversation_lock_pool_size,
+    max_overflow=0,
+    pool_pre_ping=True,
+)
+# One turn per lock connection. Turns beyond the pool size queue here for as long as it takes,
+# instead of failing on the pool checkout timeout (the in-memory mailbox does not bound turns).
+_lock_slots = asyncio.Semaphore(settings.conversation_lock_pool_size)
+
+
+async def _try_lock(connection: AsyncConnection, phone_number: str) -> bool:
+    locked = (await connection.execute(
+        text("SELECT pg_try_advisory_lock(:namespace, hashtext(:key))"),
+        {"namespace": CONVERSATION_LOCK_NAMESPACE, "key": phone_number},
+    )).scalar()
+    # The lock is session-level; don't leave the connection idle in a transaction during the turn.
+    await connection.commit()
+    return locked
+
+
+async def _unlock(connection: AsyncConnection, phone_number: str) -> None:
+    await connection.execute(
+        text("SELECT pg_advisory_unlock(:namespace, hashtext(:key))"),
+        {"namespace": CONVERSATION_LOCK_NAMESPACE, "key": phone_number},
+    )
+    await connection.commit()
+
+
+@asynccontextmanager
+async def conversation_lock(phone_number: str) -> AsyncIterator[None]:
+    """
+    Hold a Postgres advisory lock for `phone_number` across processes and hosts.
+
+    Every agent turn runs under this lock, so conversation history and the cart of one
+    customer are never modified by two turns at once. Raises TimeoutError if the lock is
+    not acquired within `settings.conversation_lock_timeout_seconds`.
+    """
+    if not settings.conversation_locking:
+        yield
+        return
+
+    loop = asyncio.get_running_loop()
+    async with _lock_slots, lock_engine.connect() as connection:
+        deadline = loop.time() + settings.conversation_lock_timeout_seconds
+        while not await _try_lock(connection, phone_number):
+            if loop.time() >= deadline:
+                raise TimeoutError(f"Conversation of {phone_number} is locked by another turn")
+            await asyncio.sleep(settings.conversation_lock_poll_seconds)
+
+        try:
+            yield
+        finally:
+            try:
+                await _unlock(connection, phone_number)
+            except Exception as e:
+                # Dropping the connection is the only other way to release a session lock.
+                logger.error(f"Could not release conversation lock of {phone_number}: {e}")
+                await connection.invalidate()
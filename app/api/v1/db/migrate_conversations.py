@@ -0,0 +1,41 @@
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+import asyncio
+import logging
+from sqlalchemy import func, select
+from db.con import engine, SessionLocal
+from db.schemas import Conversation
+from agent.history import migrate_legacy_messages
+
+logger = logging.getLogger(__name__)
+
+
+async def migrate_conversations(batch_size: int = 100) -> int:
+    """Move every legacy Conversation.messages blob into conversation_messages rows."""
+    migrated = 0
+    async with SessionLocal() as db:
+        last_id = 0
+        while True:
+            conversations = (await db.scalars(
+                select(Conversation)
+                .where(Conversation.id > last_id, func.json_array_length(Conversation.messages) > 0)
+                .order_by(Conversation.id)
+                .limit(batch_size)
+            )).all()
+            if not conversations:
+                break
+            for conversation in conversations:
+                last_id = conversation.id
+                migrated += await migrate_legacy_messages(db, conversation)
+    await engine.dispose()
+
+    logger.info(f"Migrated {migrated} messages")
+    return migrated
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(migrate_conversations())
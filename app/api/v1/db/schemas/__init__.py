@@ -3,3 +3,7 @@ from db.schemas.products import Product
 from db.schemas.carts import Cart
 from db.schemas.carts_items import CartsItems
 from db.schemas.conversations import Conversation
+from db.schemas.conversation_messages import ConversationMessage
+from db.schemas.inbound_jobs import InboundJob
+from db.schemas.message_receipts import MessageReceipt
+from db.schemas.catalog_state import CatalogState
@@ -6,8 +6,8 @@ from db.con import Base
 class Cart(Base):
     __tablename__ = "carts"
     
-    id = Column(Integer, primary_key=True, index=True)
-    phone_number = Column(String, index=True)
-    created_at = Column(DateTime, index=True)
-    updated_at = Column(DateTime, index=True)
+    id = Column(Integer, primary_key=True)
+    phone_number = Column(String, unique=True, index=True)
+    created_at = Column(DateTime)
+    updated_at = Column(DateTime)
     cart_items = relationship("CartsItems", back_populates="cart")
\ No newline at end of file
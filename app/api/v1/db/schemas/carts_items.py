@@ -1,15 +1,19 @@
-from sqlalchemy import Column, Integer, ForeignKey, DateTime
+from sqlalchemy import Boolean, Column, Integer, ForeignKey, DateTime, UniqueConstraint
 from sqlalchemy.orm import relationship
 from db.con import Base
 
 class CartsItems(Base):
     __tablename__ = "carts_items"
+    # Also serves lookups by cart_id, its leading column.
+    __table_args__ = (UniqueConstraint("cart_id", "product_id", name="uq_carts_items_cart_product"),)
     
-    id = Column(Integer, primary_key=True, index=True)
+    id = Column(Integer, primary_key=True)
     cart_id = Column(Integer, ForeignKey("carts.id"))
-    product_id = Column(Integer, ForeignKey("products.id"))
-    quantity = Column(Integer, index=True)
-    created_at = Column(DateTime, index=True)
-    updated_at = Column(DateTime, index=True)
+    product_id = Column(Integer, ForeignKey("products.id"), index=True)
+    quantity = Column(Integer)
+    created_at = Column(DateTime)
+    updated_at = Column(DateTime)
+    # False only for items added before carts reserved stock; migration 0008 reserves those.
+    stock_reserved = Column(Boolean, nullable=False, server_default="true")
     cart = relationship("Cart", back_populates="cart_items")
     product = relationship("Product", back_populates="cart_items")
\ No newline at end of file
@@ -0,0 +1,21 @@
+from sqlalchemy import BigInteger, CheckConstraint, Column, DateTime, Integer
+from sqlalchemy.sql import func
+from db.con import Base
+
+# Statements bump the slot of their backend, so concurrent catalog writers rarely share a row lock.
+CATALOG_VERSION_SLOTS = 64
+
+
+class CatalogState(Base):
+    """
+    Counter slots bumped by triggers whenever products or categories change. The catalog
+    version is the sum of all slots and its last change the latest `updated_at`.
+    """
+    __tablename__ = "catalog_state"
+    __table_args__ = (
+        CheckConstraint(f"id BETWEEN 1 AND {CATALOG_VERSION_SLOTS}", name="ck_catalog_state_slot"),
+    )
+
+    id = Column(Integer, primary_key=True)
+    version = Column(BigInteger, nullable=False, server_default="0")
+    updated_at = Column(DateTime(timezone=True), nullable=False, server_default=func.now())
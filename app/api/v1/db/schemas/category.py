@@ -5,8 +5,8 @@ from db.con import Base
 class Category(Base):
     __tablename__ = "categories"
     
-    id = Column(Integer, primary_key=True, index=True)
-    name = Column(String, index=True)
-    created_at = Column(DateTime, index=True)
-    updated_at = Column(DateTime, index=True)
+    id = Column(Integer, primary_key=True)
+    name = Column(String)
+    created_at = Column(DateTime)
+    updated_at = Column(DateTime)
     products = relationship("Product", back_populates="category")
\ No newline at end of file
@@ -6,8 +6,9 @@ from db.con import Base
 class Conversation(Base):
     __tablename__ = "conversations"
 
-    id = Column(Integer, primary_key=True, index=True)
+    id = Column(Integer, primary_key=True)
     phone_number = Column(String, unique=True, index=True)
+    # Legacy JSON blob, only read to migrate old conversations into conversation_messages.
     messages = Column(JSON, default=list)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
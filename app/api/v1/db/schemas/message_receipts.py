@@ -0,0 +1,11 @@
+from sqlalchemy import Column, String, DateTime
+from sqlalchemy.sql import func
+from db.con import Base
+
+
+class MessageReceipt(Base):
+    __tablename__ = "message_receipts"
+
+    message_sid = Column(String, primary_key=True)
+    phone_number = Column(String, nullable=False)
+    received_at = Column(DateTime(timezone=True), nullable=False, server_default=func.now(), index=True)
@@ -1,18 +1,42 @@
-from sqlalchemy import Boolean, Column, Float, ForeignKey, Integer, String, DateTime
-from sqlalchemy.orm import relationship
+from sqlalchemy import Boolean, Column, Computed, Float, ForeignKey, Index, Integer, String, DateTime
+from sqlalchemy.dialects.postgresql import TSVECTOR
+from sqlalchemy.orm import deferred, relationship
 from db.con import Base
 
+# Full-text document of a product: name above color and size above description, Spanish stemming.
+SEARCH_VECTOR_SQL = (
+    "setweight(to_tsvector('spanish', coalesce(name, '')), 'A') || "
+    "setweight(to_tsvector('spanish', coalesce(color, '') || ' ' || coalesce(size, '')), 'B') || "
+    "setweight(to_tsvector('spanish', coalesce(description, '')), 'C')"
+)
+
 class Product(Base):
     __tablename__ = "products"
+    __table_args__ = (
+        Index("ix_products_category_id_is_active", "category_id", "is_active"),
+        Index("ix_products_size", "size"),
+        Index("ix_products_color", "color"),
+        Index("ix_products_price", "price"),
+        Index("ix_products_search_vector", "search_vector", postgresql_using="gin"),
+        Index("ix_products_name_trgm", "name", postgresql_using="gin", postgresql_ops={"name": "gin_trgm_ops"}),
+        Index(
+            "ix_products_description_trgm", "description",
+            postgresql_using="gin", postgresql_ops={"description": "gin_trgm_ops"},
+        ),
+    )
     
-    id = Column(Integer, primary_key=True, index=True)
-    name = Column(String, index=True)
-    description = Column(String, index=True)
-    price = Column(Float, index=True)
-    stock = Column(Integer, index=True)
-    is_active = Column(Boolean, index=True)
+    id = Column(Integer, primary_key=True)
+    name = Column(String)
+    description = Column(String)
+    size = Column(String)
+    color = Column(String)
+    price = Column(Float)
+    stock = Column(Integer)
+    is_active = Column(Boolean)
     category_id = Column(Integer, ForeignKey("categories.id"))
     category = relationship("Category", back_populates="products")
     cart_items = relationship("CartsItems", back_populates="product")
-    created_at = Column(DateTime, index=True)
-    updated_at = Column(DateTime, index=True)
\ No newline at end of file
+    created_at = Column(DateTime)
+    updated_at = Column(DateTime)
+    # Maintained by Postgres; deferred so regular product loads don't carry it.
+    search_vector = deferred(Column(TSVECTOR, Computed(SEARCH_VECTOR_SQL, persisted=True)))
@@ -3,18 +3,27 @@ from pathlib import Path
 
 sys.path.insert(0, str(Path(__file__).parent.parent))
 
+import asyncio
 import pandas as pd
+from alembic import command
+from alembic.config import Config
 from datetime import datetime
-from sqlalchemy.orm import Session
-from db.con import engine, SessionLocal, Base
+from sqlalchemy.ext.asyncio import AsyncSession
+from db.con import engine, SessionLocal
 from db.schemas import Product, Category
+from services.catalog_store import notify_catalog_reload
+from services.products import normalize_color, normalize_size
 
 PRODUCTS_FILE = Path(__file__).parent / "data" / "products.xlsx"
+ALEMBIC_INI = Path(__file__).parent.parent / "alembic.ini"
 
 
 def reset_database():
-    Base.metadata.drop_all(bind=engine)
-    Base.metadata.create_all(bind=engine)
+    """Drop and recreate the schema through the migrations. Runs its own event loop."""
+    config = Config(str(ALEMBIC_INI))
+    config.set_main_option("script_location", str(ALEMBIC_INI.parent / "migrations"))
+    command.downgrade(config, "base")
+    command.upgrade(config, "head")
 
 
 def extract_products() -> pd.DataFrame:
@@ -33,17 +42,11 @@ def transform_products(df: pd.DataFrame, category_map: dict) -> list[dict]:
     for _, row in df.iterrows():
         is_active = str(row.get("DISPONIBLE", "")).strip().lower() in ["sí", "si", "yes", "1", "true"]
 
-        description_parts = []
-        if pd.notna(row.get("DESCRIPCIÓN")):
-            description_parts.append(str(row["DESCRIPCIÓN"]))
-        if pd.notna(row.get("TALLA")):
-            description_parts.append(f"Talla: {row['TALLA']}")
-        if pd.notna(row.get("COLOR")):
-            description_parts.append(f"Color: {row['COLOR']}")
-
         products.append({
             "name": str(row.get("TIPO_PRENDA", "")),
-            "description": " | ".join(description_parts) if description_parts else "",
+            "description": str(row["DESCRIPCIÓN"]) if pd.notna(row.get("DESCRIPCIÓN")) else "",
+            "size": normalize_size(str(row["TALLA"])) if pd.notna(row.get("TALLA")) else None,
+            "color": normalize_color(str(row["COLOR"])) if pd.notna(row.get("COLOR")) else None,
             "price": float(row.get("PRECIO_50_U", 0)),
             "stock": int(row.get("CANTIDAD_DISPONIBLE", 0)),
             "is_active": is_active,
@@ -54,40 +57,40 @@ def transform_products(df: pd.DataFrame, category_map: dict) -> list[dict]:
     return products
 
 
-def load_categories(db: Session, categories: list[dict]) -> dict:
+async def load_categories(db: AsyncSession, categories: list[dict]) -> dict:
     category_map = {}
     for cat_data in categories:
         category = Category(**cat_data)
         db.add(category)
-        db.flush()
+        await db.flush()
         category_map[cat_data["name"]] = category.id
-    db.commit()
+    await db.commit()
     return category_map
 
 
-def load_products(db: Session, products: list[dict]) -> int:
-    for prod_data in products:
-        db.add(Product(**prod_data))
-    db.commit()
+async def load_products(db: AsyncSession, products: list[dict]) -> int:
+    db.add_all(Product(**prod_data) for prod_data in products)
+    await db.commit()
     return len(products)
 
 
-def run_etl():
-    reset_database()
+async def run_etl():
     df = extract_products()
 
-    db = SessionLocal()
-    try:
-        categories = transform_categories(df)
-        category_map = load_categories(db, categories)
-        products = transform_products(df, category_map)
-        count = load_products(db, products)
-    except Exception as e:
-        db.rollback()
-        raise
-    finally:
-        db.close()
+    async with SessionLocal() as db:
+        try:
+            categories = transform_categories(df)
+            category_map = await load_categories(db, categories)
+            products = transform_products(df, category_map)
+            count = await load_products(db, products)
+            # The ETL runs in its own process; API and worker processes reload on this notification.
+            await notify_catalog_reload(db)
+        except Exception as e:
+            await db.rollback()
+            raise
+    await engine.dispose()
 
 
 if __name__ == "__main__":
-    run_etl()
+    reset_database()
+    asyncio.run(run_etl())
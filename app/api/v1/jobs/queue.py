@@ -0,0 +1,151 @@
+from dataclasses import dataclass
+from datetime import timedelta
+from typing import List, Optional
+from sqlalchemy import and_, delete, exists, func, or_, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import aliased
+
+from db.schemas.inbound_jobs import InboundJob, JOB_DEAD, JOB_DONE, JOB_PENDING, JOB_RUNNING
+
+
+@dataclass
+class ClaimedTurn:
+    """One agent turn: every pending message of a phone, claimed together."""
+    job_ids: List[int]
+    phone_number: str
+    message: str
+    attempts: int
+
+
+async def enqueue_inbound(db: AsyncSession, phone_number: str, body: str, delay_seconds: float = 0.0) -> InboundJob:
+    """Store an inbound message durably. Commits before returning."""
+    job = InboundJob(
+        phone_number=phone_number,
+        body=body,
+        status=JOB_PENDING,
+        available_at=func.now() + timedelta(seconds=delay_seconds),
+    )
+    db.add(job)
+    await db.commit()
+    return job
+
+
+async def claim_turn(db: AsyncSession, lease_seconds: float) -> Optional[ClaimedTurn]:
+    """
+    Claim the oldest due job whose phone has no turn in progress, plus every other pending
+    message of that phone, with `SELECT ... FOR UPDATE SKIP LOCKED`.
+
+    Running jobs whose lease expired (the worker died) are claimable again.
+    """
+    now = func.now()
+    in_progress = aliased(InboundJob)
+
+    def phone_busy(phone_number):
+        return exists().where(
+            in_progress.phone_number == phone_number,
+            in_progress.status == JOB_RUNNING,
+            in_progress.locked_until >= now,
+        )
+
+    head = await db.scalar(
+        select(InboundJob)
+        .where(
+            or_(
+                and_(InboundJob.status == JOB_PENDING, InboundJob.available_at <= now),
+                and_(InboundJob.status == JOB_RUNNING, InboundJob.locked_until < now),
+            ),
+            ~phone_busy(InboundJob.phone_number),
+        )
+        .order_by(InboundJob.id)
+        .with_for_update(skip_locked=True)
+        .limit(1)
+    )
+    if head is None:
+        await db.rollback()
+        return None
+
+    # Two workers can pick different jobs of the same phone in the same instant; the advisory
+    # lock serializes them and the re-check sees whichever claim committed first.
+    locked = await db.scalar(select(func.pg_try_advisory_xact_lock(func.hashtext(head.phone_number))))
+    if not locked or await db.scalar(select(phone_busy(head.phone_number))):
+        await db.rollback()
+        return None
+
+    siblings = (await db.scalars(
+        select(InboundJob)
+        .where(
+            InboundJob.phone_number == head.phone_number,
+            InboundJob.status == JOB_PENDING,
+            InboundJob.id != head.id,
+        )
+        .order_by(InboundJob.id)
+        .with_for_update(skip_locked=True)
+    )).all()
+    jobs = sorted([head, *siblings], key=lambda job: job.id)
+
+    for job in jobs:
+        job.status = JOB_RUNNING
+        job.attempts = job.attempts + 1
+        job.locked_until = now + timedelta(seconds=lease_seconds)
+
+    turn = ClaimedTurn(
+        job_ids=[job.id for job in jobs],
+        phone_number=head.phone_number,
+        message="\n".join(job.body for job in jobs),
+        attempts=max(job.attempts for job in jobs),
+    )
+    await db.commit()
+    return turn
+
+
+async def complete_turn(db: AsyncSession, turn: ClaimedTurn) -> None:
+    await db.execute(
+        update(InboundJob)
+        .where(InboundJob.id.in_(turn.job_ids))
+        .values(status=JOB_DONE, locked_until=None)
+        .execution_options(synchronize_session=False)
+    )
+    await db.commit()
+
+
+async def fail_turn(
+    db: AsyncSession,
+    turn: ClaimedTurn,
+    error: str,
+    max_attempts: int,
+    backoff_seconds: float,
+) -> bool:
+    """Schedule a retry with exponential backoff, or dead-letter the turn. Returns True if dead-lettered."""
+    dead = turn.attempts >= max_attempts
+    delay = timedelta(seconds=backoff_seconds * 2 ** (turn.attempts - 1))
+    await db.execute(
+        update(InboundJob)
+        .where(InboundJob.id.in_(turn.job_ids))
+        .values(
+            status=JOB_DEAD if dead else JOB_PENDING,
+            available_at=func.now() + delay,
+            locked_until=None,
+            last_error=error[:2000],
+        )
+        .execution_options(synchronize_session=False)
+    )
+    await db.commit()
+    return dead
+
+
+async def purge_done(db: AsyncSession, older_than_hours: float) -> int:
+    result = await db.execute(
+        delete(InboundJob)
+        .where(
+            InboundJob.status == JOB_DONE,
+            InboundJob.updated_at < func.now() - timedelta(hours=older_than_hours),
+        )
+        .execution_options(synchronize_session=False)
+    )
+    await db.commit()
+    return result.rowcount
+
+
+async def queue_stats(db: AsyncSession) -> dict:
+    counts = dict((await db.execute(select(InboundJob.status, func.count()).group_by(InboundJob.status))).all())
+    return {status: counts.get(status, 0) for status in (JOB_PENDING, JOB_RUNNING, JOB_DONE, JOB_DEAD)}
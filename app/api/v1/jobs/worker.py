@@ -0,0 +1,136 @@
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+import asyncio
+import logging
+import signal
+import time
+from typing import Awaitable, Callable, List, Optional
+
+from core.settings import settings
+from db.con import SessionLocal
+from jobs.queue import ClaimedTurn, claim_turn, complete_turn, fail_turn, purge_done
+from services.chat import answer_message, send_error_reply
+from services.receipts import purge_receipts
+
+logger = logging.getLogger(__name__)
+
+PURGE_INTERVAL_SECONDS = 600
+# A turn that was answered but not marked done is answered again after its lease expires.
+COMPLETE_ATTEMPTS = 3
+COMPLETE_RETRY_SECONDS = 1.0
+
+
+async def _with_session(fn: Callable[..., Awaitable], *args):
+    async with SessionLocal() as db:
+        return await fn(db, *args)
+
+
+async def _process(turn: ClaimedTurn) -> None:
+    try:
+        await answer_message(turn.phone_number, turn.message)
+    except Exception as e:
+        logger.error(f"Error processing jobs {turn.job_ids} (attempt {turn.attempts}): {e}")
+        dead = await _with_session(
+            fail_turn, turn, str(e),
+            settings.job_max_attempts, settings.job_retry_backoff_seconds,
+        )
+        if dead:
+            logger.error(f"Jobs {turn.job_ids} moved to the dead-letter state")
+            send_error_reply(turn.phone_number)
+        return
+
+    for attempt in range(1, COMPLETE_ATTEMPTS + 1):
+        try:
+            await _with_session(complete_turn, turn)
+            return
+        except Exception as e:
+            if attempt == COMPLETE_ATTEMPTS:
+                raise
+            logger.warning(f"Could not mark jobs {turn.job_ids} done (attempt {attempt}): {e}")
+            await asyncio.sleep(COMPLETE_RETRY_SECONDS * attempt)
+
+
+async def run_worker(worker_id: int, stop: asyncio.Event) -> None:
+    logger.info(f"Inbound job worker {worker_id} started")
+    last_purge = time.monotonic()
+    while not stop.is_set():
+        try:
+            turn = await _with_session(claim_turn, settings.job_lease_seconds)
+        except Exception as e:
+            logger.error(f"Worker {worker_id} could not claim a job: {e}")
+            turn = None
+
+        if turn is None:
+            if worker_id == 0 and time.monotonic() - last_purge > PURGE_INTERVAL_SECONDS:
+                try:
+                    await _with_session(purge_done, settings.job_retention_hours)
+                    await _with_session(purge_receipts, settings.webhook_receipt_retention_hours)
+                except Exception as e:
+                    logger.error(f"Worker {worker_id} could not purge old jobs and receipts: {e}")
+                last_purge = time.monotonic()
+            try:
+                await asyncio.wait_for(stop.wait(), settings.job_poll_interval_seconds)
+            except asyncio.TimeoutError:
+                pass
+            continue
+
+        try:
+            await _process(turn)
+        except Exception as e:
+            # Recording the outcome failed (e.g. a transient DB error); the jobs are claimed
+            # again when their lease expires. Keep this worker alive for the next ones.
+            logger.error(f"Worker {worker_id} could not record the outcome of jobs {turn.job_ids}: {e}")
+    logger.info(f"Inbound job worker {worker_id} stopped")
+
+
+class WorkerPool:
+    """A pool of async workers draining the inbound_jobs table."""
+
+    def __init__(self, concurrency: int):
+        self._concurrency = concurrency
+        self._stop = asyncio.Event()
+        self._tasks: List[asyncio.Task] = []
+
+    def start(self) -> None:
+        self._tasks = [
+            asyncio.create_task(run_worker(worker_id, self._stop))
+            for worker_id in range(self._concurrency)
+        ]
+
+    async def stop(self) -> None:
+        """Let in-flight turns finish, then stop claiming."""
+        self._stop.set()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+
+    async def wait(self) -> None:
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+
+
+async def main(concurrency: Optional[int] = None) -> None:
+    from services.catalog_store import catalog_store
+    from services.whatsapp import whatsapp_sender
+
+    await catalog_store.start()
+    await whatsapp_sender.start()
+    pool = WorkerPool(concurrency or settings.job_workers)
+    pool.start()
+
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, lambda: asyncio.create_task(pool.stop()))
+
+    await pool.wait()
+    await whatsapp_sender.stop()
+    await catalog_store.stop()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(
+        level=logging.INFO,
+        format="%(asctime)s | %(levelname)-8s | %(name)s | %(message)s",
+        datefmt="%Y-%m-%d %H:%M:%S",
+    )
+    asyncio.run(main())
@@ -1,13 +1,20 @@
 import logging
-import sys
 import fastapi
 from contextlib import asynccontextmanager
-from db.con import Base, engine
-from db.schemas import Category, Product, Cart, CartsItems, Conversation
+from db.con import engine, SessionLocal
 from router.products.router import router as products_router
 from router.categories.router import router as categories_router
 from router.carts.router import router as carts_router
-from router.chat.router import router as chat_router
+from router.chat.router import router as chat_router, mailbox
+from core.cache import catalog_cache
+from core.metrics import stage_latencies
+from services.whatsapp import whatsapp_sender
+from core.settings import settings
+from jobs.queue import queue_stats
+from services.receipts import purge_receipts
+from jobs.worker import WorkerPool
+from agent.response_cache import response_cache
+from services.catalog_store import catalog_store
 import logfire
 
 logfire.configure()
@@ -23,15 +30,25 @@ logging.basicConfig(
 
 logger = logging.getLogger(__name__)
 
-Base.metadata.create_all(bind=engine)
-
 @asynccontextmanager
 async def lifespan(app: fastapi.FastAPI):
     logger.info("App lifespan started")
-    Base.metadata.create_all(bind=engine)
-    logger.info("Database initialized")
+    async with SessionLocal() as db:
+        await purge_receipts(db, settings.webhook_receipt_retention_hours)
+    await catalog_store.start()
+    await whatsapp_sender.start()
+    worker_pool = None
+    if settings.inbound_queue == "postgres" and settings.job_workers_in_api:
+        worker_pool = WorkerPool(settings.job_workers)
+        worker_pool.start()
     yield
     logger.info("App shutting down")
+    if worker_pool:
+        await worker_pool.stop()
+    await mailbox.close()
+    await whatsapp_sender.stop()
+    await catalog_store.stop()
+    await engine.dispose()
 
 app = fastapi.FastAPI(lifespan=lifespan)
 
@@ -47,6 +64,24 @@ logfire.instrument_fastapi(app)
 def health_check():
     return {"status": "ok"}
 
+
+@app.get("/metrics")
+async def metrics():
+    inbound_jobs = None
+    if settings.inbound_queue == "postgres":
+        async with SessionLocal() as db:
+            inbound_jobs = await queue_stats(db)
+    
+    return {
+        "inbound_jobs": inbound_jobs,
+        "catalog_cache": catalog_cache.stats(),
+        "catalog_store": catalog_store.stats(),
+        "response_cache": response_cache.stats(),
+        "chat_active_phones": mailbox.active_phones,
+        "whatsapp_sender": whatsapp_sender.stats(),
+        "latency": stage_latencies.summary(),
+    }
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8000)
@@ -0,0 +1,129 @@
+"""Baseline: the schema as created by Base.metadata.create_all before versioned migrations.
+
+Databases created that way are adopted with `alembic stamp 0001` and then upgraded.
+
+Revision ID: 0001
+Revises:
+Create Date: 2026-10-18
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0001"
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "categories",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("name", sa.String()),
+        sa.Column("created_at", sa.DateTime()),
+        sa.Column("updated_at", sa.DateTime()),
+    )
+    for column in ("id", "name", "created_at", "updated_at"):
+        op.create_index(f"ix_categories_{column}", "categories", [column])
+
+    op.create_table(
+        "products",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("name", sa.String()),
+        sa.Column("description", sa.String()),
+        sa.Column("price", sa.Float()),
+        sa.Column("stock", sa.Integer()),
+        sa.Column("is_active", sa.Boolean()),
+        sa.Column("category_id", sa.Integer(), sa.ForeignKey("categories.id")),
+        sa.Column("created_at", sa.DateTime()),
+        sa.Column("updated_at", sa.DateTime()),
+    )
+    for column in ("id", "name", "description", "price", "stock", "is_active", "created_at", "updated_at"):
+        op.create_index(f"ix_products_{column}", "products", [column])
+
+    op.create_table(
+        "carts",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("phone_number", sa.String()),
+        sa.Column("created_at", sa.DateTime()),
+        sa.Column("updated_at", sa.DateTime()),
+    )
+    for column in ("id", "phone_number", "created_at", "updated_at"):
+        op.create_index(f"ix_carts_{column}", "carts", [column])
+
+    op.create_table(
+        "carts_items",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("cart_id", sa.Integer(), sa.ForeignKey("carts.id")),
+        sa.Column("product_id", sa.Integer(), sa.ForeignKey("products.id")),
+        sa.Column("quantity", sa.Integer()),
+        sa.Column("created_at", sa.DateTime()),
+        sa.Column("updated_at", sa.DateTime()),
+    )
+    for column in ("id", "quantity", "created_at", "updated_at"):
+        op.create_index(f"ix_carts_items_{column}", "carts_items", [column])
+
+    op.create_table(
+        "conversations",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("phone_number", sa.String()),
+        sa.Column("messages", sa.JSON()),
+        sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.func.now()),
+        sa.Column("updated_at", sa.DateTime(timezone=True), server_default=sa.func.now()),
+    )
+    op.create_index("ix_conversations_id", "conversations", ["id"])
+    op.create_index("ix_conversations_phone_number", "conversations", ["phone_number"], unique=True)
+
+    op.create_table(
+        "conversation_messages",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column(
+            "conversation_id",
+            sa.Integer(),
+            sa.ForeignKey("conversations.id", ondelete="CASCADE"),
+            nullable=False,
+        ),
+        sa.Column("seq", sa.Integer(), nullable=False),
+        sa.Column("kind", sa.String(), nullable=False),
+        sa.Column("message", sa.JSON(), nullable=False),
+        sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.func.now()),
+        sa.UniqueConstraint("conversation_id", "seq", name="uq_conversation_messages_conversation_id_seq"),
+    )
+
+    op.create_table(
+        "inbound_jobs",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("phone_number", sa.String(), nullable=False),
+        sa.Column("body", sa.Text(), nullable=False),
+        sa.Column("status", sa.String(), nullable=False),
+        sa.Column("attempts", sa.Integer(), nullable=False),
+        sa.Column("available_at", sa.DateTime(timezone=True), nullable=False, server_default=sa.func.now()),
+        sa.Column("locked_until", sa.DateTime(timezone=True)),
+        sa.Column("last_error", sa.Text()),
+        sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.func.now()),
+        sa.Column("updated_at", sa.DateTime(timezone=True), server_default=sa.func.now()),
+    )
+    op.create_index("ix_inbound_jobs_status_available_at", "inbound_jobs", ["status", "available_at"])
+    op.create_index("ix_inbound_jobs_phone_number_status", "inbound_jobs", ["phone_number", "status"])
+
+    op.create_table(
+        "message_receipts",
+        sa.Column("message_sid", sa.String(), primary_key=True),
+        sa.Column("phone_number", sa.String(), nullable=False),
+        sa.Column("received_at", sa.DateTime(timezone=True), nullable=False, server_default=sa.func.now()),
+    )
+    op.create_index("ix_message_receipts_received_at", "message_receipts", ["received_at"])
+
+
+def downgrade() -> None:
+    for table in (
+        "message_receipts",
+        "inbound_jobs",
+        "conversation_messages",
+        "conversations",
+        "carts_items",
+        "carts",
+        "products",
+        "categories",
+    ):
+        op.drop_table(table)
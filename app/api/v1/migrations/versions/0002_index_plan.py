@@ -0,0 +1,78 @@
+"""Index plan derived from the queries the API, agent and workers actually run.
+
+Drops single-column indexes that no query filters or sorts on (they only slow down writes),
+indexes that duplicate a primary key, and adds:
+
+- products (category_id, is_active): catalog listing by category and availability.
+- carts.phone_number UNIQUE: one cart per customer; every agent cart call looks it up.
+- carts_items (cart_id, product_id) UNIQUE: one line per product, the target of the cart
+  upsert; it also serves lookups by cart_id. Duplicate lines are merged into the oldest one.
+- carts_items.product_id: the FK side not covered by uq_carts_items_cart_product.
+
+The unique cart index fails if a phone number already has several carts; merge those first.
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-18
+"""
+from alembic import op
+
+revision = "0002"
+down_revision = "0001"
+branch_labels = None
+depends_on = None
+
+UNUSED_INDEXES = {
+    "categories": ("id", "name", "created_at", "updated_at"),
+    "products": ("id", "name", "description", "price", "stock", "is_active", "created_at", "updated_at"),
+    "carts": ("id", "created_at", "updated_at"),
+    "carts_items": ("id", "quantity", "created_at", "updated_at"),
+    "conversations": ("id",),
+}
+
+
+def _merge_duplicate_cart_items() -> None:
+    op.execute("""
+        UPDATE carts_items SET quantity = merged.quantity
+        FROM (
+            SELECT min(id) AS id, sum(quantity) AS quantity FROM carts_items
+            WHERE cart_id IS NOT NULL AND product_id IS NOT NULL
+            GROUP BY cart_id, product_id HAVING count(*) > 1
+        ) AS merged
+        WHERE carts_items.id = merged.id
+    """)
+    op.execute("""
+        DELETE FROM carts_items USING carts_items AS kept
+        WHERE carts_items.cart_id = kept.cart_id
+            AND carts_items.product_id = kept.product_id
+            AND carts_items.id > kept.id
+    """)
+
+
+def upgrade() -> None:
+    for table, columns in UNUSED_INDEXES.items():
+        for column in columns:
+            op.drop_index(f"ix_{table}_{column}", table_name=table)
+
+    op.create_index("ix_products_category_id_is_active", "products", ["category_id", "is_active"])
+
+    op.drop_index("ix_carts_phone_number", table_name="carts")
+    op.create_index("ix_carts_phone_number", "carts", ["phone_number"], unique=True)
+
+    _merge_duplicate_cart_items()
+    op.create_unique_constraint("uq_carts_items_cart_product", "carts_items", ["cart_id", "product_id"])
+    op.create_index("ix_carts_items_product_id", "carts_items", ["product_id"])
+
+
+def downgrade() -> None:
+    op.drop_index("ix_carts_items_product_id", table_name="carts_items")
+    op.drop_constraint("uq_carts_items_cart_product", "carts_items", type_="unique")
+
+    op.drop_index("ix_carts_phone_number", table_name="carts")
+    op.create_index("ix_carts_phone_number", "carts", ["phone_number"])
+
+    op.drop_index("ix_products_category_id_is_active", table_name="products")
+
+    for table, columns in UNUSED_INDEXES.items():
+        for column in columns:
+            op.create_index(f"ix_{table}_{column}", table_name=table, columns=[column])
@@ -0,0 +1,46 @@
+"""NOTIFY catalog_changes with the table and id of every changed product or category.
+
+Notifications are delivered when the transaction commits, so listeners never see a change
+that was rolled back. Each API and worker process refreshes its in-memory catalog from them.
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-18
+"""
+from alembic import op
+
+revision = "0004"
+down_revision = "0003"
+branch_labels = None
+depends_on = None
+
+CATALOG_TABLES = ("products", "categories")
+
+
+def upgrade() -> None:
+    op.execute("""
+        CREATE FUNCTION notify_catalog_change() RETURNS trigger AS $$
+        BEGIN
+            PERFORM pg_notify(
+                'catalog_changes',
+                json_build_object(
+                    'table', TG_TABLE_NAME,
+                    'id', CASE WHEN TG_OP = 'DELETE' THEN OLD.id ELSE NEW.id END
+                )::text
+            );
+            RETURN NULL;
+        END
+        $$ LANGUAGE plpgsql
+    """)
+    for table in CATALOG_TABLES:
+        op.execute(f"""
+            CREATE TRIGGER {table}_notify_catalog_change
+            AFTER INSERT OR UPDATE OR DELETE ON {table}
+            FOR EACH ROW EXECUTE FUNCTION notify_catalog_change()
+        """)
+
+
+def downgrade() -> None:
+    for table in CATALOG_TABLES:
+        op.execute(f"DROP TRIGGER {table}_notify_catalog_change ON {table}")
+    op.execute("DROP FUNCTION notify_catalog_change()")
@@ -0,0 +1,50 @@
+"""Full-text and fuzzy product search.
+
+- products.search_vector: generated Spanish tsvector of name (weight A) and description
+  (weight B), with a GIN index for `@@` matches and ts_rank_cd ranking.
+- pg_trgm GIN indexes on name and description for typo-tolerant `<%` word similarity.
+
+Creating pg_trgm needs a role allowed to create extensions (or the extension already installed).
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2026-10-18
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects.postgresql import TSVECTOR
+
+revision = "0005"
+down_revision = "0004"
+branch_labels = None
+depends_on = None
+
+SEARCH_VECTOR_SQL = (
+    "setweight(to_tsvector('spanish', coalesce(name, '')), 'A') || "
+    "setweight(to_tsvector('spanish', coalesce(description, '')), 'B')"
+)
+TRIGRAM_COLUMNS = ("name", "description")
+
+
+def upgrade() -> None:
+    op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+
+    op.add_column(
+        "products",
+        sa.Column("search_vector", TSVECTOR(), sa.Computed(SEARCH_VECTOR_SQL, persisted=True)),
+    )
+    op.create_index("ix_products_search_vector", "products", ["search_vector"], postgresql_using="gin")
+
+    for column in TRIGRAM_COLUMNS:
+        op.create_index(
+            f"ix_products_{column}_trgm", "products", [column],
+            postgresql_using="gin", postgresql_ops={column: "gin_trgm_ops"},
+        )
+
+
+def downgrade() -> None:
+    for column in TRIGRAM_COLUMNS:
+        op.drop_index(f"ix_products_{column}_trgm", table_name="products")
+
+    op.drop_index("ix_products_search_vector", table_name="products")
+    op.drop_column("products", "search_vector")
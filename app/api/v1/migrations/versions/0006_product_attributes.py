@@ -0,0 +1,72 @@
+"""Size and color as product columns, for filtering and facet counts.
+
+The ETL used to append them to the description ("... | Talla: M | Color: Negro"). They are
+moved out of existing descriptions into `size` (upper case) and `color` (capitalized words),
+each indexed, and `price` gets its index back for price-range filters. The search vector is
+regenerated to include them.
+
+Revision ID: 0006
+Revises: 0005
+Create Date: 2026-10-18
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects.postgresql import TSVECTOR
+
+revision = "0006"
+down_revision = "0005"
+branch_labels = None
+depends_on = None
+
+OLD_SEARCH_VECTOR_SQL = (
+    "setweight(to_tsvector('spanish', coalesce(name, '')), 'A') || "
+    "setweight(to_tsvector('spanish', coalesce(description, '')), 'B')"
+)
+SEARCH_VECTOR_SQL = (
+    "setweight(to_tsvector('spanish', coalesce(name, '')), 'A') || "
+    "setweight(to_tsvector('spanish', coalesce(color, '') || ' ' || coalesce(size, '')), 'B') || "
+    "setweight(to_tsvector('spanish', coalesce(description, '')), 'C')"
+)
+ATTRIBUTE_INDEXES = ("size", "color", "price")
+
+
+def _replace_search_vector(expression: str) -> None:
+    op.drop_index("ix_products_search_vector", table_name="products")
+    op.drop_column("products", "search_vector")
+    op.add_column("products", sa.Column("search_vector", TSVECTOR(), sa.Computed(expression, persisted=True)))
+    op.create_index("ix_products_search_vector", "products", ["search_vector"], postgresql_using="gin")
+
+
+def upgrade() -> None:
+    op.add_column("products", sa.Column("size", sa.String(), nullable=True))
+    op.add_column("products", sa.Column("color", sa.String(), nullable=True))
+
+    op.execute(r"""
+        UPDATE products SET
+            size = nullif(upper(btrim(substring(description from 'Talla: ([^|]*)'))), ''),
+            color = nullif(initcap(btrim(substring(description from 'Color: ([^|]*)'))), ''),
+            description = btrim(regexp_replace(description, '\s*\|?\s*(Talla|Color): [^|]*', '', 'g'))
+        WHERE description ~ '(Talla|Color): '
+    """)
+
+    for column in ATTRIBUTE_INDEXES:
+        op.create_index(f"ix_products_{column}", "products", [column])
+
+    _replace_search_vector(SEARCH_VECTOR_SQL)
+
+
+def downgrade() -> None:
+    _replace_search_vector(OLD_SEARCH_VECTOR_SQL)
+
+    for column in ATTRIBUTE_INDEXES:
+        op.drop_index(f"ix_products_{column}", table_name="products")
+
+    op.execute("""
+        UPDATE products SET description = concat_ws(
+            ' | ', nullif(description, ''), 'Talla: ' || size, 'Color: ' || color
+        )
+        WHERE size IS NOT NULL OR color IS NOT NULL
+    """)
+
+    op.drop_column("products", "color")
+    op.drop_column("products", "size")
@@ -0,0 +1,82 @@
+"""Spread the catalog version over counter slots, bumped once per statement.
+
+Every cart write updates products.stock, so a single catalog_state row bumped by every
+product change serialized all cart commits on its row lock. The version is now the sum of
+CATALOG_VERSION_SLOTS rows; a statement bumps the slot of its backend, so concurrent
+transactions only wait on each other when their connections share a slot. Readers sum the
+slots in their own snapshot, so the version still changes with every committed change.
+
+Revision ID: 0007
+Revises: 0006
+Create Date: 2026-10-18
+"""
+from alembic import op
+
+revision = "0007"
+down_revision = "0006"
+branch_labels = None
+depends_on = None
+
+CATALOG_TABLES = ("products", "categories")
+CATALOG_VERSION_SLOTS = 64
+
+
+def upgrade() -> None:
+    for table in CATALOG_TABLES:
+        op.execute(f"DROP TRIGGER {table}_bump_catalog_version ON {table}")
+
+    op.drop_constraint("ck_catalog_state_single_row", "catalog_state", type_="check")
+    op.create_check_constraint(
+        "ck_catalog_state_slot", "catalog_state", f"id BETWEEN 1 AND {CATALOG_VERSION_SLOTS}"
+    )
+    op.execute(f"""
+        INSERT INTO catalog_state (id, version)
+        SELECT slot, 0 FROM generate_series(2, {CATALOG_VERSION_SLOTS}) AS slot
+    """)
+
+    op.execute(f"""
+        CREATE OR REPLACE FUNCTION bump_catalog_version() RETURNS trigger AS $$
+        BEGIN
+            UPDATE catalog_state SET version = version + 1, updated_at = now()
+            WHERE id = 1 + pg_backend_pid() % {CATALOG_VERSION_SLOTS};
+            RETURN NULL;
+        END
+        $$ LANGUAGE plpgsql
+    """)
+    for table in CATALOG_TABLES:
+        op.execute(f"""
+            CREATE TRIGGER {table}_bump_catalog_version
+            AFTER INSERT OR UPDATE OR DELETE ON {table}
+            FOR EACH STATEMENT EXECUTE FUNCTION bump_catalog_version()
+        """)
+
+
+def downgrade() -> None:
+    for table in CATALOG_TABLES:
+        op.execute(f"DROP TRIGGER {table}_bump_catalog_version ON {table}")
+
+    op.execute("""
+        UPDATE catalog_state SET
+            version = (SELECT sum(version) FROM catalog_state),
+            updated_at = (SELECT max(updated_at) FROM catalog_state)
+        WHERE id = 1
+    """)
+    op.execute("DELETE FROM catalog_state WHERE id <> 1")
+    op.drop_constraint("ck_catalog_state_slot", "catalog_state", type_="check")
+    op.create_check_constraint("ck_catalog_state_single_row", "catalog_state", "id = 1")
+
+    op.execute("""
+        CREATE OR REPLACE FUNCTION bump_catalog_version() RETURNS trigger AS $$
+        BEGIN
+            UPDATE catalog_state SET version = version + 1, updated_at = now() WHERE id = 1;
+            RETURN NULL;
+        END
+        $$ LANGUAGE plpgsql
+    """)
+    for table in CATALOG_TABLES:
+        op.execute(f"""
+            CREATE CONSTRAINT TRIGGER {table}_bump_catalog_version
+            AFTER INSERT OR UPDATE OR DELETE ON {table}
+            DEFERRABLE INITIALLY DEFERRED
+            FOR EACH ROW EXECUTE FUNCTION bump_catalog_version()
+        """)
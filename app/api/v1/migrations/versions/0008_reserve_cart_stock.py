@@ -0,0 +1,50 @@
+"""Reserve the stock of items that were already in carts.
+
+products.stock is the unreserved stock since cart writes reserve units (and give them back
+when items are removed). Items added before that never took their units, so removing them
+would raise stock above what exists. This subtracts the quantities held in carts once.
+Products whose carts hold more than their stock end up negative: they were oversold, and
+stay unavailable until those items are removed.
+
+`carts_items.stock_reserved` records which items hold their units. Existing rows start as
+False and are reserved here; rows written afterwards default to True. The reserving code
+maps the column, so it cannot fill carts before this migration has run.
+
+Revision ID: 0008
+Revises: 0007
+Create Date: 2026-10-18
+"""
+import sqlalchemy as sa
+from alembic import op
+
+revision = "0008"
+down_revision = "0007"
+branch_labels = None
+depends_on = None
+
+
+def _move_reserved_stock(sign: str, reserved: bool) -> None:
+    op.execute(f"""
+        UPDATE products SET stock = products.stock {sign} reserved.quantity
+        FROM (
+            SELECT product_id, sum(quantity) AS quantity FROM carts_items
+            WHERE stock_reserved = {str(reserved).lower()}
+            GROUP BY product_id
+        ) AS reserved
+        WHERE products.id = reserved.product_id
+    """)
+
+
+def upgrade() -> None:
+    op.add_column(
+        "carts_items",
+        sa.Column("stock_reserved", sa.Boolean(), nullable=False, server_default="false"),
+    )
+    _move_reserved_stock("-", reserved=False)
+    op.execute("UPDATE carts_items SET stock_reserved = true WHERE NOT stock_reserved")
+    op.alter_column("carts_items", "stock_reserved", server_default="true")
+
+
+def downgrade() -> None:
+    _move_reserved_stock("+", reserved=True)
+    op.drop_column("carts_items", "stock_reserved")
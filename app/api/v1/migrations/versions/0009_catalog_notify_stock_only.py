@@ -0,0 +1,53 @@
+"""Flag stock-only product updates in catalog notifications.
+
+Cached catalog lists and search results are tagged with the products they contain, which is
+enough for stock changes. Any other change (a new product, activation, another category,
+price, name...) can add a product to a list it is not tagged with, so listeners invalidate
+every cached list for it. `stock_only` tells the two apart.
+
+Revision ID: 0009
+Revises: 0008
+Create Date: 2026-10-18
+"""
+from alembic import op
+
+revision = "0009"
+down_revision = "0008"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.execute("""
+        CREATE OR REPLACE FUNCTION notify_catalog_change() RETURNS trigger AS $$
+        BEGIN
+            PERFORM pg_notify(
+                'catalog_changes',
+                json_build_object(
+                    'table', TG_TABLE_NAME,
+                    'id', CASE WHEN TG_OP = 'DELETE' THEN OLD.id ELSE NEW.id END,
+                    'stock_only', TG_OP = 'UPDATE' AND TG_TABLE_NAME = 'products'
+                        AND to_jsonb(NEW) - 'stock' - 'updated_at' = to_jsonb(OLD) - 'stock' - 'updated_at'
+                )::text
+            );
+            RETURN NULL;
+        END
+        $$ LANGUAGE plpgsql
+    """)
+
+
+def downgrade() -> None:
+    op.execute("""
+        CREATE OR REPLACE FUNCTION notify_catalog_change() RETURNS trigger AS $$
+        BEGIN
+            PERFORM pg_notify(
+                'catalog_changes',
+                json_build_object(
+                    'table', TG_TABLE_NAME,
+                    'id', CASE WHEN TG_OP = 'DELETE' THEN OLD.id ELSE NEW.id END
+                )::text
+            );
+            RETURN NULL;
+        END
+        $$ LANGUAGE plpgsql
+    """)
@@ -1,6 +1,6 @@
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, model_validator
 from datetime import datetime
-from typing import Optional, List
+from typing import Literal, Optional, List
 
 
 class CartItemBase(BaseModel):
@@ -8,6 +8,28 @@ class CartItemBase(BaseModel):
     quantity: int = Field(gt=0)
 
 
+class CartItemOperation(BaseModel):
+    """`add` and `remove` change the quantity by `quantity`; `set` overwrites it (0 removes the item).
+    `remove` without a quantity removes the whole item."""
+    op: Literal["add", "remove", "set"]
+    product_id: int
+    quantity: Optional[int] = Field(default=None, ge=0)
+
+    @model_validator(mode="after")
+    def check_quantity(self) -> "CartItemOperation":
+        if self.op == "add" and not self.quantity:
+            raise ValueError("add requires a positive quantity")
+        if self.op == "set" and self.quantity is None:
+            raise ValueError("set requires a quantity")
+        return self
+
+
+class CartItemsPatch(BaseModel):
+    items: List[CartItemOperation] = []
+    # Drop every item of the cart that is not mentioned in `items`.
+    replace: bool = False
+
+
 class CartItemResponse(BaseModel):
     id: int
     product_id: int
@@ -38,3 +60,23 @@ class CartResponse(BaseModel):
 
     class Config:
         from_attributes = True
+
+
+class CartLineView(BaseModel):
+    product_id: int
+    name: str
+    unit_price: float
+    quantity: int
+    line_total: float
+    # in_stock, low_stock, out_of_stock or inactive, counting the units this line reserved
+    # together with the unreserved stock.
+    stock_status: Literal["in_stock", "low_stock", "out_of_stock", "inactive"]
+
+
+class CartView(BaseModel):
+    """A cart with product details and totals, ready to show to a customer."""
+    id: int
+    phone_number: str
+    items: List[CartLineView] = []
+    item_count: int = 0
+    total: float = 0.0
@@ -1,6 +1,6 @@
 from pydantic import BaseModel
 from datetime import datetime
-from typing import Optional
+from typing import List, Optional
 
 
 class CategoryBase(BaseModel):
@@ -15,6 +15,8 @@ class ProductResponse(BaseModel):
     id: int
     name: str
     description: Optional[str] = None
+    size: Optional[str] = None
+    color: Optional[str] = None
     price: float
     stock: int
     is_active: bool
@@ -25,3 +27,33 @@ class ProductResponse(BaseModel):
 
     class Config:
         from_attributes = True
+
+
+class ProductBatchResponse(BaseModel):
+    products: List[ProductResponse] = []
+    missing_ids: List[int] = []
+
+
+class FacetCount(BaseModel):
+    value: str
+    count: int
+
+
+class CategoryFacetCount(BaseModel):
+    id: int
+    name: str
+    count: int
+
+
+class PriceRange(BaseModel):
+    min: Optional[float] = None
+    max: Optional[float] = None
+
+
+class ProductFacets(BaseModel):
+    """Counts of matching products per attribute value. Each facet ignores its own filter."""
+    total: int
+    sizes: List[FacetCount] = []
+    colors: List[FacetCount] = []
+    categories: List[CategoryFacetCount] = []
+    price: PriceRange = PriceRange()
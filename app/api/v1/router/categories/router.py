@@ -1,32 +1,63 @@
-from fastapi import APIRouter, Depends, HTTPException, status, Query
-from sqlalchemy.orm import Session
-from typing import List
+import orjson
+from fastapi import APIRouter, Depends, HTTPException, Query, Response, status
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import List, Optional
 
 from db.con import get_db
-from db.schemas import Category
 from models.categories import CategoryResponse
+from services import categories as category_service
+from services.catalog import catalog_validators
+from services.catalog_store import catalog_store
 
 router = APIRouter(prefix="/categories", tags=["Categories"])
 
+AFTER_ID_DESCRIPTION = "Return categories with an id greater than this cursor (from `X-Next-Cursor`); replaces `skip`"
+
 
 @router.get("", response_model=List[CategoryResponse])
-def get_categories(
+async def get_categories(
     skip: int = Query(0, ge=0),
     limit: int = Query(100, ge=1, le=100),
-    db: Session = Depends(get_db)
+    after_id: Optional[int] = Query(None, ge=0, description=AFTER_ID_DESCRIPTION),
+    db: AsyncSession = Depends(get_db),
+    validators: dict = Depends(catalog_validators),
 ):
-    categories = db.query(Category).offset(skip).limit(limit).all()
-    return categories
+    headers = dict(validators)
+
+    if catalog_store.ready:
+        categories = catalog_store.list_categories(skip, limit, after_id)
+        if len(categories) == limit:
+            headers["X-Next-Cursor"] = str(categories[-1]["id"])
+        return Response(content=orjson.dumps(categories), media_type="application/json", headers=headers)
+
+    rows = await category_service.list_category_rows(db, skip, limit, after_id)
+    if len(rows) == limit:
+        headers["X-Next-Cursor"] = str(rows[-1].id)
+
+    # Rows are encoded straight to JSON bytes; the body matches List[CategoryResponse].
+    return Response(
+        content=category_service.encode_category_rows(rows),
+        media_type="application/json",
+        headers=headers,
+    )
 
 
 @router.get("/{category_id}", response_model=CategoryResponse)
-def get_category(category_id: int, db: Session = Depends(get_db)):
-    category = db.query(Category).filter(Category.id == category_id).first()
-    
-    if not category:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail=f"Category with id {category_id} not found"
-        )
-    
+async def get_category(
+    category_id: int,
+    response: Response,
+    db: AsyncSession = Depends(get_db),
+    validators: dict = Depends(catalog_validators),
+):
+    if catalog_store.ready:
+        category = catalog_store.get_category(category_id)
+        if category is None:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail=f"Category with id {category_id} not found"
+            )
+        return Response(content=orjson.dumps(category), media_type="application/json", headers=validators)
+
+    category = await category_service.get_category(db, category_id)
+    response.headers.update(validators)
     return category
@@ -0,0 +1,60 @@
+import asyncio
+import logging
+import time
+from typing import Awaitable, Callable, Dict, List
+
+from core.metrics import stage_latencies
+
+logger = logging.getLogger(__name__)
+
+
+class PhoneMailbox:
+    """
+    Serializes inbound messages per phone number.
+
+    Only one handler call runs at a time for a given phone. The first message of a phone is
+    handled right away; messages that arrive while its turn runs, or within `coalesce_window`
+    seconds after it ends, are merged into the next handler call.
+    """
+
+    def __init__(self, handler: Callable[[str, str], Awaitable[None]], coalesce_window: float):
+        self._handler = handler
+        self._coalesce_window = coalesce_window
+        self._pending: Dict[str, List[str]] = {}
+        self._first_arrival: Dict[str, float] = {}
+        self._workers: Dict[str, asyncio.Task] = {}
+
+    def submit(self, phone_number: str, message: str) -> None:
+        self._pending.setdefault(phone_number, []).append(message)
+        self._first_arrival.setdefault(phone_number, time.perf_counter())
+        if phone_number not in self._workers:
+            self._workers[phone_number] = asyncio.create_task(self._drain(phone_number))
+
+    async def _drain(self, phone_number: str) -> None:
+        try:
+            idle = True
+            while True:
+                if not idle:
+                    await asyncio.sleep(self._coalesce_window)
+                idle = False
+                messages = self._pending.pop(phone_number, None)
+                if not messages:
+                    break
+                stage_latencies.record("mailbox_wait", time.perf_counter() - self._first_arrival.pop(phone_number))
+                if len(messages) > 1:
+                    logger.info(f"Coalesced {len(messages)} messages from {phone_number}")
+                try:
+                    await self._handler(phone_number, "\n".join(messages))
+                except Exception as e:
+                    logger.error(f"Error handling messages from {phone_number}: {e}")
+        finally:
+            self._workers.pop(phone_number, None)
+
+    @property
+    def active_phones(self) -> int:
+        return len(self._workers)
+
+    async def close(self) -> None:
+        """Wait for every queued turn to finish."""
+        while self._workers:
+            await asyncio.gather(*self._workers.values(), return_exceptions=True)
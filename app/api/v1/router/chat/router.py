@@ -1,66 +1,54 @@
-from fastapi import APIRouter, Form, Response, Depends, BackgroundTasks
-from sqlalchemy.orm import Session
-from twilio.rest import Client
+from fastapi import APIRouter, Form, Response, Depends
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import Optional
 import logging
-import traceback
 
-from agent.main import run_sales_agent
-from db.con import get_db, SessionLocal
+from db.con import get_db
 from core.settings import settings
+from jobs.queue import enqueue_inbound
+from router.chat.mailbox import PhoneMailbox
+from services.chat import process_and_send_message
+from services.receipts import record_receipt, recent_message_ids
 
 logger = logging.getLogger(__name__)
 
 router = APIRouter(prefix="/chat", tags=["Chat"])
 
-twilio_client = Client(settings.twilio_account_sid, settings.twilio_auth_token)
+mailbox = PhoneMailbox(process_and_send_message, settings.chat_coalesce_window_seconds)
 
 
-async def process_and_send_message(phone_number: str, message: str):
-    db = SessionLocal()
-    try:
-        agent_response = await run_sales_agent(
-            user_message=message,
-            user_phone=phone_number,
-            db_session=db
-        )
-        
-        response_text = agent_response.response
-        logger.info(f"Sending response to {phone_number}: {response_text[:100]}...")
-        
-        twilio_client.messages.create(
-            body=response_text,
-            from_=f"whatsapp:{settings.twilio_phone_number}",
-            to=f"whatsapp:{phone_number}"
-        )
-        
-    except Exception as e:
-        logger.error(f"Error processing message: {e}")
-        logger.error(traceback.format_exc())
-        try:
-            twilio_client.messages.create(
-                body="Lo siento, hubo un error procesando tu mensaje. Intenta de nuevo.",
-                from_=f"whatsapp:{settings.twilio_phone_number}",
-                to=f"whatsapp:{phone_number}"
-            )
-        except Exception as send_error:
-            logger.error(f"Error sending error message: {send_error}")
-    finally:
-        db.close()
+def _twiml_ack() -> Response:
+    return Response(
+        content='<?xml version="1.0" encoding="UTF-8"?><Response></Response>',
+        media_type="application/xml"
+    )
 
 
 @router.post("/webhook/twilio")
 async def twilio_webhook(
-    background_tasks: BackgroundTasks,
     Body: str = Form(...),
     From: str = Form(...),
-    db: Session = Depends(get_db),
+    MessageSid: Optional[str] = Form(None),
+    db: AsyncSession = Depends(get_db),
 ):
     phone_number = From.replace("whatsapp:", "")
+    
+    if MessageSid:
+        if MessageSid in recent_message_ids or not await record_receipt(db, MessageSid, phone_number):
+            await db.rollback()
+            recent_message_ids.add(MessageSid)
+            logger.info(f"Ignoring duplicate delivery of {MessageSid} from {phone_number}")
+            return _twiml_ack()
+    
     logger.info(f"Received message from {phone_number}: {Body}")
     
-    background_tasks.add_task(process_and_send_message, phone_number, Body)
+    if settings.inbound_queue == "postgres":
+        await enqueue_inbound(db, phone_number, Body, delay_seconds=settings.chat_coalesce_window_seconds)
+    else:
+        await db.commit()
+        mailbox.submit(phone_number, Body)
     
-    return Response(
-        content='<?xml version="1.0" encoding="UTF-8"?><Response></Response>',
-        media_type="application/xml"
-    )
+    if MessageSid:
+        recent_message_ids.add(MessageSid)
+    
+    return _twiml_ack()
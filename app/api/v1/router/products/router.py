@@ -1,47 +1,166 @@
-from fastapi import APIRouter, Depends, HTTPException, status, Query
-from sqlalchemy.orm import Session, joinedload
+import orjson
+from fastapi import APIRouter, Depends, HTTPException, Query, Response, status
+from fastapi.responses import JSONResponse
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import List, Optional
 
 from db.con import get_db
-from db.schemas import Product
-from models.products import ProductResponse
+from models.products import ProductBatchResponse, ProductFacets, ProductResponse
+from services import products as product_service
+from services.catalog import catalog_validators
+from services.catalog_store import catalog_store
 
 router = APIRouter(prefix="/products", tags=["Products"])
 
+FIELDS_DESCRIPTION = "Comma separated list of product fields to return, e.g. `id,name,price,stock`"
+AFTER_ID_DESCRIPTION = "Return products with an id greater than this cursor (from `X-Next-Cursor`); replaces `skip`"
+SIZE_DESCRIPTION = "Only products of this size, e.g. `M` (case insensitive)"
+COLOR_DESCRIPTION = "Only products of this color, e.g. `Negro` (case insensitive)"
+
+
+def _json(content: bytes, headers: dict) -> Response:
+    return Response(content=content, media_type="application/json", headers=headers)
+
 
 @router.get("", response_model=List[ProductResponse])
-def get_products(
+async def get_products(
     skip: int = Query(0, ge=0),
     limit: int = Query(100, ge=1, le=100),
     category_id: Optional[int] = None,
     is_active: Optional[bool] = None,
-    db: Session = Depends(get_db)
+    size: Optional[str] = Query(None, description=SIZE_DESCRIPTION),
+    color: Optional[str] = Query(None, description=COLOR_DESCRIPTION),
+    min_price: Optional[float] = Query(None, ge=0),
+    max_price: Optional[float] = Query(None, ge=0),
+    after_id: Optional[int] = Query(None, ge=0, description=AFTER_ID_DESCRIPTION),
+    fields: Optional[str] = Query(None, description=FIELDS_DESCRIPTION),
+    db: AsyncSession = Depends(get_db),
+    validators: dict = Depends(catalog_validators),
 ):
-    query = db.query(Product).options(joinedload(Product.category))
-    
-    if category_id is not None:
-        query = query.filter(Product.category_id == category_id)
-    
-    if is_active is not None:
-        query = query.filter(Product.is_active == is_active)
-    
-    products = query.offset(skip).limit(limit).all()
-    return products
+    projection = product_service.parse_fields(fields)
+    headers = dict(validators)
 
+    if catalog_store.ready:
+        products = catalog_store.list_products(
+            skip, limit, category_id, is_active, after_id, size, color, min_price, max_price
+        )
+        if len(products) == limit:
+            headers["X-Next-Cursor"] = str(products[-1]["id"])
+        return _json(product_service.encode_products(products, projection), headers)
 
-@router.get("/{product_id}", response_model=ProductResponse)
-def get_product(product_id: int, db: Session = Depends(get_db)):
-    product = (
-        db.query(Product)
-        .options(joinedload(Product.category))
-        .filter(Product.id == product_id)
-        .first()
+    rows = await product_service.list_product_rows(
+        db, skip, limit, category_id, is_active, after_id, projection, size, color, min_price, max_price
     )
-    
-    if not product:
-        raise HTTPException(
-            status_code=status.HTTP_404_NOT_FOUND,
-            detail=f"Product with id {product_id} not found"
-        )
-    
-    return product
+    if len(rows) == limit:
+        headers["X-Next-Cursor"] = str(rows[-1].id)
+
+    # Rows are encoded straight to JSON bytes; the body matches List[ProductResponse] (or its projection).
+    return _json(product_service.encode_product_rows(rows, projection), headers)
+
+
+# Declared before /{product_id} so "search" and "facets" are not parsed as product ids.
+@router.get("/search", response_model=List[ProductResponse])
+async def search_products(
+    q: str = Query(..., min_length=2, max_length=200, description="Free text, e.g. `camperas negras talle M`"),
+    skip: int = Query(0, ge=0),
+    limit: int = Query(20, ge=1, le=100),
+    category_id: Optional[int] = None,
+    is_active: Optional[bool] = None,
+    size: Optional[str] = Query(None, description=SIZE_DESCRIPTION),
+    color: Optional[str] = Query(None, description=COLOR_DESCRIPTION),
+    min_price: Optional[float] = Query(None, ge=0),
+    max_price: Optional[float] = Query(None, ge=0),
+    fields: Optional[str] = Query(None, description=FIELDS_DESCRIPTION),
+    db: AsyncSession = Depends(get_db),
+    validators: dict = Depends(catalog_validators),
+):
+    projection = product_service.parse_fields(fields)
+    # Stemming and trigram ranking live in Postgres, so search always reads through the database.
+    rows = await product_service.search_product_rows(
+        db, q, skip, limit, category_id, is_active, projection, size, color, min_price, max_price
+    )
+    return _json(product_service.encode_product_rows(rows, projection), validators)
+
+
+@router.get("/facets", response_model=ProductFacets)
+async def get_product_facets(
+    response: Response,
+    category_id: Optional[int] = None,
+    is_active: Optional[bool] = None,
+    size: Optional[str] = Query(None, description=SIZE_DESCRIPTION),
+    color: Optional[str] = Query(None, description=COLOR_DESCRIPTION),
+    min_price: Optional[float] = Query(None, ge=0),
+    max_price: Optional[float] = Query(None, ge=0),
+    db: AsyncSession = Depends(get_db),
+    validators: dict = Depends(catalog_validators),
+):
+    if catalog_store.ready:
+        facets = catalog_store.facets(category_id, is_active, size, color, min_price, max_price)
+        return _json(orjson.dumps(facets), validators)
+
+    response.headers.update(validators)
+    return await product_service.get_product_facets(
+        db, category_id, is_active, size, color, min_price, max_price
+    )
+
+
+# Declared before /{product_id} so "batch" is not parsed as a product id.
+@router.get("/batch", response_model=ProductBatchResponse)
+async def get_products_batch(
+    response: Response,
+    ids: str = Query(..., description="Comma separated product ids, e.g. `3,7,12`"),
+    fields: Optional[str] = Query(None, description=FIELDS_DESCRIPTION),
+    db: AsyncSession = Depends(get_db),
+    validators: dict = Depends(catalog_validators),
+):
+    product_ids = product_service.parse_ids(ids)
+    projection = product_service.parse_fields(fields)
+
+    if catalog_store.ready:
+        products, missing = catalog_store.get_products(product_ids)
+        return _json(orjson.dumps({
+            "products": [product_service.select_fields(product, projection) for product in products],
+            "missing_ids": missing,
+        }), validators)
+
+    with_category = projection is None or "category" in projection
+    products, missing = await product_service.get_products_by_ids(db, product_ids, with_category)
+
+    if projection is None:
+        response.headers.update(validators)
+        return {"products": products, "missing_ids": missing}
+    return JSONResponse(
+        {
+            "products": [product_service.project_product(product, projection) for product in products],
+            "missing_ids": missing,
+        },
+        headers=validators,
+    )
+
+
+@router.get("/{product_id}", response_model=ProductResponse)
+async def get_product(
+    product_id: int,
+    response: Response,
+    fields: Optional[str] = Query(None, description=FIELDS_DESCRIPTION),
+    db: AsyncSession = Depends(get_db),
+    validators: dict = Depends(catalog_validators),
+):
+    projection = product_service.parse_fields(fields)
+
+    if catalog_store.ready:
+        product = catalog_store.get_product(product_id)
+        if product is None:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail=f"Product with id {product_id} not found"
+            )
+        return _json(orjson.dumps(product_service.select_fields(product, projection)), validators)
+
+    with_category = projection is None or "category" in projection
+    product = await product_service.get_product(db, product_id, with_category)
+
+    if projection is None:
+        response.headers.update(validators)
+        return product
+    return JSONResponse(product_service.project_product(product, projection), headers=validators)
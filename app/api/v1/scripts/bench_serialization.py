@@ -0,0 +1,100 @@
+"""
+Benchmarks the product list response paths against the database configured in .env.
+
+orm:  ORM objects with joinedload(category), validated through List[ProductResponse] with
+      from_attributes and encoded like FastAPI's JSONResponse (the previous endpoint path).
+fast: column rows from list_product_rows encoded straight to JSON bytes with orjson.
+
+Both bodies are compared to make sure the response schema did not change.
+
+    cd app/api/v1
+    python scripts/bench_serialization.py --limit 100 --iterations 200
+"""
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+import argparse
+import asyncio
+import json
+import time
+from typing import List
+
+from pydantic import TypeAdapter
+
+from core.metrics import StageLatencies
+from db.con import SessionLocal, engine
+from models.products import ProductResponse
+from services import products as product_service
+
+_products_adapter = TypeAdapter(List[ProductResponse])
+
+
+def _encode_like_fastapi(products: list) -> bytes:
+    validated = _products_adapter.validate_python(products, from_attributes=True)
+    content = _products_adapter.dump_python(validated, mode="json")
+    return json.dumps(content, ensure_ascii=False, allow_nan=False, indent=None, separators=(",", ":")).encode()
+
+
+async def orm_path(limit: int, latencies: StageLatencies) -> bytes:
+    start = time.perf_counter()
+    async with SessionLocal() as db:
+        products = await product_service.list_products(db, 0, limit)
+    queried = time.perf_counter()
+    body = _encode_like_fastapi(products)
+    latencies.record("orm_query", queried - start)
+    latencies.record("orm_serialize", time.perf_counter() - queried)
+    return body
+
+
+async def fast_path(limit: int, latencies: StageLatencies) -> bytes:
+    start = time.perf_counter()
+    async with SessionLocal() as db:
+        rows = await product_service.list_product_rows(db, 0, limit)
+    queried = time.perf_counter()
+    body = product_service.encode_product_rows(rows)
+    latencies.record("fast_query", queried - start)
+    latencies.record("fast_serialize", time.perf_counter() - queried)
+    return body
+
+
+async def run(limit: int, iterations: int) -> dict:
+    latencies = StageLatencies()
+    try:
+        orm_body = await orm_path(limit, StageLatencies())
+        fast_body = await fast_path(limit, StageLatencies())
+        if json.loads(orm_body) != json.loads(fast_body):
+            raise SystemExit("The fast path returns a different body than the ORM path")
+
+        for _ in range(iterations):
+            await orm_path(limit, latencies)
+            await fast_path(limit, latencies)
+    finally:
+        await engine.dispose()
+
+    summary = latencies.summary()
+
+    def total_p50(path: str) -> float:
+        return summary[f"{path}_query"]["p50_ms"] + summary[f"{path}_serialize"]["p50_ms"]
+
+    return {
+        "rows_per_page": len(json.loads(fast_body)),
+        "iterations": iterations,
+        "latency": summary,
+        "p50_ms_per_page": {"orm": round(total_p50("orm"), 3), "fast": round(total_p50("fast"), 3)},
+        "speedup_p50": round(total_p50("orm") / total_p50("fast"), 2) if total_p50("fast") else None,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--limit", type=int, default=100, help="Products per page")
+    parser.add_argument("--iterations", type=int, default=200, help="Pages fetched by each path")
+    args = parser.parse_args()
+
+    print(json.dumps(asyncio.run(run(args.limit, args.iterations)), indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,125 @@
+"""
+Checks that the hot queries of the API, agent and workers are served by the intended indexes.
+
+Runs EXPLAIN on each query against the database configured in .env (after `alembic upgrade
+head`) and exits non-zero if a plan does not use its expected index. Sequential scans are
+disabled for the check, because on a small dev catalog the planner rightly prefers them; what
+matters is that a usable index exists once the tables grow.
+
+    cd app/api/v1
+    python scripts/explain_hot_queries.py
+"""
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+import asyncio
+import json
+from datetime import datetime, timedelta
+
+from sqlalchemy import cast, func, literal, select, text
+from sqlalchemy.dialects import postgresql
+from sqlalchemy.dialects.postgresql import REGCONFIG
+
+from db.con import engine
+from db.schemas import Cart, CartsItems, Conversation, ConversationMessage, InboundJob, MessageReceipt, Product
+from db.schemas.inbound_jobs import JOB_PENDING
+
+# (name, statement, index the plan must use)
+HOT_QUERIES = [
+    (
+        "products by category and availability",
+        select(Product).where(Product.category_id == 1, Product.is_active.is_(True)).limit(100),
+        "ix_products_category_id_is_active",
+    ),
+    (
+        "products by size",
+        select(Product).where(Product.size == "M", Product.is_active.is_(True)).limit(100),
+        "ix_products_size",
+    ),
+    (
+        "products by price range",
+        select(Product.id).where(Product.price.between(10, 20)),
+        "ix_products_price",
+    ),
+    ("product by id", select(Product).where(Product.id == 1), "products_pkey"),
+    (
+        "product full-text search",
+        select(Product.id).where(
+            Product.search_vector.op("@@")(func.to_tsquery(cast("spanish", REGCONFIG), "campera | negra"))
+        ),
+        "ix_products_search_vector",
+    ),
+    (
+        "product fuzzy name search",
+        select(Product.id).where(literal("campera").op("<%")(Product.name)),
+        "ix_products_name_trgm",
+    ),
+    ("products batch", select(Product).where(Product.id.in_([1, 2, 3])), "products_pkey"),
+    ("cart by phone", select(Cart).where(Cart.phone_number == "+10000000000"), "ix_carts_phone_number"),
+    ("items of a cart", select(CartsItems).where(CartsItems.cart_id == 1), "uq_carts_items_cart_product"),
+    (
+        "cart items holding a product",
+        select(func.sum(CartsItems.quantity)).where(CartsItems.product_id == 1),
+        "ix_carts_items_product_id",
+    ),
+    (
+        "conversation by phone",
+        select(Conversation).where(Conversation.phone_number == "+10000000000"),
+        "ix_conversations_phone_number",
+    ),
+    (
+        "conversation history",
+        select(ConversationMessage).where(ConversationMessage.conversation_id == 1).order_by(ConversationMessage.seq),
+        "uq_conversation_messages_conversation_id_seq",
+    ),
+    (
+        "due inbound jobs",
+        select(InboundJob.id).where(InboundJob.status == JOB_PENDING, InboundJob.available_at <= datetime(2030, 1, 1)),
+        "ix_inbound_jobs_status_available_at",
+    ),
+    (
+        "receipt purge",
+        select(MessageReceipt.message_sid).where(MessageReceipt.received_at < datetime(2030, 1, 1) - timedelta(hours=72)),
+        "ix_message_receipts_received_at",
+    ),
+]
+
+
+def _index_names(plan: dict) -> set[str]:
+    names = {plan["Index Name"]} if "Index Name" in plan else set()
+    for child in plan.get("Plans", []):
+        names |= _index_names(child)
+    return names
+
+
+async def explain_all() -> list[dict]:
+    results = []
+    async with engine.connect() as connection:
+        await connection.execute(text("SET enable_seqscan = off"))
+        for name, statement, expected_index in HOT_QUERIES:
+            sql = str(statement.compile(dialect=postgresql.dialect(), compile_kwargs={"literal_binds": True}))
+            raw = (await connection.execute(text(f"EXPLAIN (FORMAT JSON) {sql}"))).scalar()
+            plan = (json.loads(raw) if isinstance(raw, str) else raw)[0]["Plan"]
+            used = _index_names(plan)
+            results.append({
+                "query": name,
+                "expected_index": expected_index,
+                "indexes_used": sorted(used),
+                "ok": expected_index in used,
+            })
+    await engine.dispose()
+    return results
+
+
+def main() -> None:
+    results = asyncio.run(explain_all())
+    print(json.dumps(results, indent=2))
+    failed = [result["query"] for result in results if not result["ok"]]
+    if failed:
+        raise SystemExit(f"Queries not using their expected index: {', '.join(failed)}")
+
+
+if __name__ == "__main__":
+    main()
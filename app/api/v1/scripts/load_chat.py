@@ -0,0 +1,170 @@
+"""
+Replays concurrent synthetic WhatsApp conversations through the real FastAPI app.
+
+Uses the offline model and the fake WhatsApp sender, so no OpenRouter or Twilio calls are made.
+The database is the one configured in .env.
+
+    cd app/api/v1
+    python scripts/load_chat.py --phones 200 --messages 5
+"""
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+import argparse
+import asyncio
+import json
+import os
+import time
+import uuid
+
+os.environ.setdefault("AGENT_MODEL_MODE", "offline")
+os.environ.setdefault("WHATSAPP_SENDER", "fake")
+os.environ.setdefault("OPENROUTER_APIKEY", "offline")
+os.environ.setdefault("TWILIO_ACCOUNT_SID", "offline")
+os.environ.setdefault("TWILIO_AUTH_TOKEN", "offline")
+os.environ.setdefault("TWILIO_PHONE_NUMBER", "+10000000000")
+
+import httpx
+from sqlalchemy import delete, func, select, update
+
+from core.metrics import QueryCounter, StageLatencies, stage_latencies
+from core.settings import settings
+from db.con import engine, SessionLocal
+from db.schemas import Cart, CartsItems, Conversation, ConversationMessage, Product
+from jobs.queue import queue_stats
+from jobs.worker import WorkerPool
+from main import app
+from router.chat.router import mailbox
+from services.whatsapp import FakeSender, whatsapp_sender
+
+SCRIPT = [
+    "hola, que productos tienen?",
+    "ver categorias",
+    "quiero comprar 1",
+    "mostrame mi carrito",
+    "que otros productos hay?",
+]
+PHONE_PREFIX = "+999"
+
+
+def synthetic_phones(count: int) -> list[str]:
+    return [f"{PHONE_PREFIX}{index:08d}" for index in range(count)]
+
+
+async def reset_phones(phones: list[str]) -> None:
+    async with SessionLocal() as db:
+        conversation_ids = select(Conversation.id).where(Conversation.phone_number.in_(phones))
+        cart_ids = select(Cart.id).where(Cart.phone_number.in_(phones))
+        # Cart items hold reserved stock; give it back before deleting them.
+        reserved = (
+            select(CartsItems.product_id, func.sum(CartsItems.quantity).label("quantity"))
+            .where(CartsItems.cart_id.in_(cart_ids))
+            .group_by(CartsItems.product_id)
+            .subquery()
+        )
+        for statement in (
+            update(Product)
+            .where(Product.id == reserved.c.product_id)
+            .values(stock=Product.stock + reserved.c.quantity),
+            delete(ConversationMessage).where(ConversationMessage.conversation_id.in_(conversation_ids)),
+            delete(Conversation).where(Conversation.phone_number.in_(phones)),
+            delete(CartsItems).where(CartsItems.cart_id.in_(cart_ids)),
+            delete(Cart).where(Cart.phone_number.in_(phones)),
+        ):
+            await db.execute(statement.execution_options(synchronize_session=False))
+        await db.commit()
+
+
+async def simulate_phone(
+    client: httpx.AsyncClient,
+    phone: str,
+    messages: int,
+    think_time: float,
+    webhook_latencies: StageLatencies,
+) -> None:
+    for index in range(messages):
+        start = time.perf_counter()
+        response = await client.post(
+            "/api/v1/chat/webhook/twilio",
+            data={
+                "Body": SCRIPT[index % len(SCRIPT)],
+                "From": f"whatsapp:{phone}",
+                "MessageSid": f"SMloadtest{uuid.uuid4().hex}",
+            },
+        )
+        webhook_latencies.record("webhook", time.perf_counter() - start)
+        response.raise_for_status()
+        await asyncio.sleep(think_time)
+
+
+async def _jobs_in_flight() -> int:
+    async with SessionLocal() as db:
+        stats = await queue_stats(db)
+    return stats["pending"] + stats["running"]
+
+
+async def wait_for_replies() -> None:
+    await mailbox.close()
+    if settings.inbound_queue == "postgres":
+        while await _jobs_in_flight():
+            await asyncio.sleep(0.2)
+
+
+async def run(phones: int, messages: int, think_time: float) -> dict:
+    numbers = synthetic_phones(phones)
+    await reset_phones(numbers)
+    stage_latencies.reset()
+    queries = QueryCounter().attach(engine.sync_engine)
+    webhook_latencies = StageLatencies()
+    sent_before = whatsapp_sender.total
+
+    # ASGITransport does not run the app lifespan, so start the job workers here.
+    worker_pool = None
+    if settings.inbound_queue == "postgres":
+        worker_pool = WorkerPool(settings.job_workers)
+        worker_pool.start()
+
+    start = time.perf_counter()
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://loadtest") as client:
+        await asyncio.gather(*(
+            simulate_phone(client, phone, messages, think_time, webhook_latencies) for phone in numbers
+        ))
+    await wait_for_replies()
+    elapsed = time.perf_counter() - start
+
+    if worker_pool:
+        await worker_pool.stop()
+
+    turns = stage_latencies.summary().get("turn", {}).get("count", 0)
+    return {
+        "phones": phones,
+        "messages_sent": phones * messages,
+        "agent_turns": turns,
+        "replies_delivered": whatsapp_sender.total - sent_before,
+        "elapsed_seconds": round(elapsed, 2),
+        "turns_per_second": round(turns / elapsed, 2) if elapsed else 0.0,
+        "db_queries": queries.count,
+        "db_queries_per_turn": round(queries.count / turns, 2) if turns else 0.0,
+        "latency": {**webhook_latencies.summary(), **stage_latencies.summary()},
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--phones", type=int, default=50, help="Concurrent synthetic phones")
+    parser.add_argument("--messages", type=int, default=5, help="Messages sent by each phone")
+    parser.add_argument("--think-time", type=float, default=2.0, help="Seconds between a phone's messages")
+    args = parser.parse_args()
+
+    if not isinstance(whatsapp_sender, FakeSender):
+        raise SystemExit("Refusing to run the load harness against the real Twilio sender")
+
+    report = asyncio.run(run(args.phones, args.messages, args.think_time))
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,130 @@
+"""
+Races many carts for the few units of one hot product and checks nothing is oversold.
+
+Creates a throwaway category, product and carts in the database configured in .env, runs the
+cart service concurrently, verifies the final stock and reservations add up, then cleans up.
+
+    cd app/api/v1
+    python scripts/stock_contention.py --stock 50 --carts 500 --concurrency 25
+"""
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent))
+
+import argparse
+import asyncio
+import json
+import time
+from datetime import datetime
+
+from fastapi import HTTPException
+from sqlalchemy import delete, func, select
+
+from core.metrics import StageLatencies
+from db.con import SessionLocal, engine
+from db.schemas import Cart, CartsItems, Category, Product
+from models.carts import CartCreate, CartItemOperation, CartItemsPatch
+from services import carts as cart_service
+
+PHONE_PREFIX = "+998"
+
+
+async def setup(stock: int, carts: int) -> tuple[int, int, list[str]]:
+    now = datetime.utcnow()
+    phones = [f"{PHONE_PREFIX}{index:08d}" for index in range(carts)]
+    async with SessionLocal() as db:
+        category = Category(name="stock-contention", created_at=now, updated_at=now)
+        db.add(category)
+        await db.flush()
+        product = Product(
+            name="stock-contention", description="", price=1.0, stock=stock,
+            is_active=True, category_id=category.id, created_at=now, updated_at=now,
+        )
+        db.add(product)
+        await db.commit()
+    for phone in phones:
+        async with SessionLocal() as db:
+            await cart_service.create_cart(db, CartCreate(phone_number=phone))
+    return category.id, product.id, phones
+
+
+async def teardown(category_id: int, product_id: int, phones: list[str]) -> None:
+    async with SessionLocal() as db:
+        cart_ids = select(Cart.id).where(Cart.phone_number.in_(phones))
+        await db.execute(delete(CartsItems).where(CartsItems.cart_id.in_(cart_ids)))
+        await db.execute(delete(Cart).where(Cart.phone_number.in_(phones)))
+        await db.execute(delete(Product).where(Product.id == product_id))
+        await db.execute(delete(Category).where(Category.id == category_id))
+        await db.commit()
+
+
+async def reserve_one(
+    phone: str,
+    product_id: int,
+    semaphore: asyncio.Semaphore,
+    latencies: StageLatencies,
+) -> bool:
+    async with semaphore:
+        start = time.perf_counter()
+        try:
+            async with SessionLocal() as db:
+                await cart_service.patch_items_by_phone(
+                    db, phone, CartItemsPatch(items=[CartItemOperation(op="add", product_id=product_id, quantity=1)])
+                )
+            return True
+        except HTTPException:
+            return False
+        finally:
+            latencies.record("reserve", time.perf_counter() - start)
+
+
+async def run(stock: int, carts: int, concurrency: int) -> dict:
+    category_id, product_id, phones = await setup(stock, carts)
+    latencies = StageLatencies()
+    semaphore = asyncio.Semaphore(concurrency)
+    try:
+        start = time.perf_counter()
+        results = await asyncio.gather(*(reserve_one(phone, product_id, semaphore, latencies) for phone in phones))
+        elapsed = time.perf_counter() - start
+
+        async with SessionLocal() as db:
+            remaining = await db.scalar(select(Product.stock).where(Product.id == product_id))
+            reserved = await db.scalar(
+                select(func.coalesce(func.sum(CartsItems.quantity), 0)).where(CartsItems.product_id == product_id)
+            )
+    finally:
+        await teardown(category_id, product_id, phones)
+        await engine.dispose()
+
+    succeeded = sum(results)
+    return {
+        "initial_stock": stock,
+        "carts": carts,
+        "concurrency": concurrency,
+        "reservations_succeeded": succeeded,
+        "reservations_rejected": carts - succeeded,
+        "remaining_stock": remaining,
+        "units_in_carts": reserved,
+        "consistent": succeeded == min(stock, carts) and remaining + reserved == stock and remaining >= 0,
+        "elapsed_seconds": round(elapsed, 2),
+        "attempts_per_second": round(carts / elapsed, 2) if elapsed else 0.0,
+        "latency": latencies.summary(),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--stock", type=int, default=50, help="Units of the hot product")
+    parser.add_argument("--carts", type=int, default=500, help="Carts each trying to take one unit")
+    parser.add_argument("--concurrency", type=int, default=25, help="Reservations in flight at once")
+    args = parser.parse_args()
+
+    report = asyncio.run(run(args.stock, args.carts, args.concurrency))
+    print(json.dumps(report, indent=2))
+    if not report["consistent"]:
+        raise SystemExit("Stock and reservations do not add up")
+
+
+if __name__ == "__main__":
+    main()
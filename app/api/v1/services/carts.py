@@ -0,0 +1,342 @@
+from fastapi import HTTPException, status
+from sqlalchemy import Integer, column, delete, func, select, update, values
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import joinedload
+from sqlalchemy.orm.attributes import set_committed_value
+from datetime import datetime
+from typing import Optional
+
+from core.cache import invalidate_products
+from db.schemas import Cart, CartsItems, Product
+from models.carts import CartCreate, CartUpdate, CartItemBase, CartItemsPatch, CartLineView, CartView
+from services.catalog_store import catalog_store
+
+# Below this many unreserved units a cart line is reported as low stock.
+LOW_STOCK_THRESHOLD = 5
+
+
+async def _load_cart(db: AsyncSession, cart_id: int) -> Optional[Cart]:
+    result = await db.execute(
+        select(Cart)
+        .options(joinedload(Cart.cart_items))
+        .where(Cart.id == cart_id)
+        .execution_options(populate_existing=True)
+    )
+    return result.unique().scalars().first()
+
+
+async def _lock_cart(db: AsyncSession, *criteria) -> Optional[Cart]:
+    # Row lock: concurrent writes to the same cart run one after the other.
+    result = await db.execute(
+        select(Cart)
+        .options(joinedload(Cart.cart_items))
+        .where(*criteria)
+        .with_for_update(of=Cart)
+        .execution_options(populate_existing=True)
+    )
+    return result.unique().scalars().first()
+
+
+def _merge_quantities(items: list[CartItemBase]) -> dict[int, int]:
+    quantities: dict[int, int] = {}
+    for item in items:
+        quantities[item.product_id] = quantities.get(item.product_id, 0) + item.quantity
+    return quantities
+
+
+async def _reserve_stock(db: AsyncSession, deltas: dict[int, int], reserved: dict[int, int]) -> None:
+    """
+    Move stock between products and the cart with one conditional UPDATE.
+
+    `stock` is the unreserved stock: a positive delta takes units only where enough are left,
+    a negative delta gives them back. Concurrent carts never oversell and only wait on each
+    other for the product rows they share. Those rows are locked first in id order, since an
+    UPDATE ... FROM locks them in whatever order its join produces and could deadlock.
+    """
+    deltas = {product_id: delta for product_id, delta in deltas.items() if delta}
+    if not deltas:
+        return
+    await db.execute(
+        select(Product.id).where(Product.id.in_(deltas)).order_by(Product.id).with_for_update()
+    )
+    changes = values(
+        column("product_id", Integer), column("delta", Integer), name="changes"
+    ).data(sorted(deltas.items()))
+    updated = set((await db.execute(
+        update(Product)
+        .where(Product.id == changes.c.product_id, Product.stock >= changes.c.delta)
+        .values(stock=Product.stock - changes.c.delta)
+        .returning(Product.id)
+        .execution_options(synchronize_session=False)
+    )).scalars())
+    if len(updated) == len(deltas):
+        return
+
+    failed = sorted(set(deltas) - updated)
+    products = {
+        row.id: row
+        for row in await db.execute(select(Product.id, Product.name, Product.stock).where(Product.id.in_(failed)))
+    }
+    await db.rollback()
+    product = products.get(failed[0])
+    if not product:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Product with id {failed[0]} not found"
+        )
+    raise HTTPException(
+        status_code=status.HTTP_400_BAD_REQUEST,
+        detail=f"Insufficient stock for product {product.name}. "
+               f"Available: {(product.stock or 0) + reserved.get(product.id, 0)}"
+    )
+
+
+async def _sync_items(db: AsyncSession, cart: Cart, quantities: dict[int, int], now: datetime) -> set[int]:
+    """
+    Make the items of a loaded cart match `quantities`, writing only the rows that changed and
+    reserving or releasing the difference in stock. Returns the product ids whose stock changed.
+    """
+    current = {item.product_id: item for item in cart.cart_items}
+    reserved = {product_id: item.quantity for product_id, item in current.items()}
+    await _reserve_stock(
+        db,
+        {
+            product_id: quantities.get(product_id, 0) - reserved.get(product_id, 0)
+            for product_id in quantities.keys() | reserved.keys()
+        },
+        reserved,
+    )
+
+    removed = [item.id for product_id, item in current.items() if product_id not in quantities]
+    unchanged = [item for product_id, item in current.items() if quantities.get(product_id) == item.quantity]
+    rows = [
+        {
+            "cart_id": cart.id,
+            "product_id": product_id,
+            "quantity": quantity,
+            "created_at": now,
+            "updated_at": now,
+        }
+        for product_id, quantity in quantities.items()
+        if product_id not in current or current[product_id].quantity != quantity
+    ]
+
+    if removed:
+        await db.execute(
+            delete(CartsItems)
+            .where(CartsItems.id.in_(removed))
+            .execution_options(synchronize_session=False)
+        )
+
+    upserted = []
+    if rows:
+        statement = insert(CartsItems).values(rows)
+        upserted = list(await db.scalars(
+            statement.on_conflict_do_update(
+                index_elements=[CartsItems.cart_id, CartsItems.product_id],
+                set_={"quantity": statement.excluded.quantity, "updated_at": statement.excluded.updated_at},
+            )
+            .returning(CartsItems),
+            execution_options={"populate_existing": True},
+        ))
+
+    # The response is built from the untouched rows and the RETURNING of the upsert, not a re-select.
+    set_committed_value(cart, "cart_items", sorted(unchanged + upserted, key=lambda item: item.id))
+
+    return {
+        product_id for product_id in quantities.keys() | current.keys()
+        if quantities.get(product_id) != (current[product_id].quantity if product_id in current else None)
+    }
+
+
+async def create_cart(db: AsyncSession, cart_data: CartCreate) -> Cart:
+    existing_cart = (
+        await db.execute(select(Cart.id).where(Cart.phone_number == cart_data.phone_number))
+    ).first()
+    if existing_cart:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Cart already exists for phone number {cart_data.phone_number}"
+        )
+
+    now = datetime.utcnow()
+    new_cart = Cart(
+        phone_number=cart_data.phone_number,
+        created_at=now,
+        updated_at=now
+    )
+    db.add(new_cart)
+    await db.flush()
+    set_committed_value(new_cart, "cart_items", [])
+
+    touched_product_ids = await _sync_items(db, new_cart, _merge_quantities(cart_data.items or []), now)
+
+    await db.commit()
+    invalidate_products(touched_product_ids)
+    await catalog_store.read_own_writes(touched_product_ids)
+    return new_cart
+
+
+async def _save_items(db: AsyncSession, cart: Cart, quantities: dict[int, int]) -> Cart:
+    now = datetime.utcnow()
+    touched_product_ids = await _sync_items(db, cart, quantities, now)
+    cart.updated_at = now
+    await db.commit()
+    invalidate_products(touched_product_ids)
+    await catalog_store.read_own_writes(touched_product_ids)
+    return cart
+
+
+async def update_cart(db: AsyncSession, cart_id: int, cart_data: CartUpdate) -> Cart:
+    cart = await _lock_cart(db, Cart.id == cart_id)
+
+    if not cart:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Cart with id {cart_id} not found"
+        )
+
+    if cart_data.phone_number is not None:
+        existing = (
+            await db.execute(
+                select(Cart.id).where(Cart.phone_number == cart_data.phone_number, Cart.id != cart_id)
+            )
+        ).first()
+        if existing:
+            await db.rollback()
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail=f"Phone number {cart_data.phone_number} is already associated with another cart"
+            )
+        cart.phone_number = cart_data.phone_number
+
+    if cart_data.items is None:
+        cart.updated_at = datetime.utcnow()
+        await db.commit()
+        return cart
+    return await _save_items(db, cart, _merge_quantities(cart_data.items))
+
+
+async def get_cart(db: AsyncSession, cart_id: int) -> Cart:
+    cart = await _load_cart(db, cart_id)
+
+    if not cart:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Cart with id {cart_id} not found"
+        )
+
+    return cart
+
+
+async def get_cart_by_phone(db: AsyncSession, phone_number: str) -> Cart:
+    result = await db.execute(
+        select(Cart)
+        .options(joinedload(Cart.cart_items))
+        .where(Cart.phone_number == phone_number)
+    )
+    cart = result.unique().scalars().first()
+
+    if not cart:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Cart not found for phone number {phone_number}"
+        )
+
+    return cart
+
+
+def _stock_status(stock: int, reserved: int, is_active: bool) -> str:
+    """Status of a cart line: the units it already reserved count as available to its customer."""
+    stock += reserved
+    if not is_active:
+        return "inactive"
+    if stock <= 0:
+        return "out_of_stock"
+    if stock < LOW_STOCK_THRESHOLD:
+        return "low_stock"
+    return "in_stock"
+
+
+async def get_cart_view_by_phone(db: AsyncSession, phone_number: str) -> CartView:
+    """Cart lines with product name, price, stock status and totals from one joined query."""
+    rows = (await db.execute(
+        select(
+            Cart.id,
+            Cart.phone_number,
+            CartsItems.product_id,
+            # These columns are nullable; a missing price or stock counts as zero.
+            func.coalesce(CartsItems.quantity, 0).label("quantity"),
+            Product.name,
+            func.coalesce(Product.price, 0).label("price"),
+            func.coalesce(Product.stock, 0).label("stock"),
+            Product.is_active,
+        )
+        .select_from(Cart)
+        .outerjoin(CartsItems, CartsItems.cart_id == Cart.id)
+        .outerjoin(Product, Product.id == CartsItems.product_id)
+        .where(Cart.phone_number == phone_number)
+        .order_by(CartsItems.id)
+    )).all()
+
+    if not rows:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Cart not found for phone number {phone_number}"
+        )
+
+    items = [
+        CartLineView(
+            product_id=row.product_id,
+            name=row.name,
+            unit_price=row.price,
+            quantity=row.quantity,
+            line_total=round(row.price * row.quantity, 2),
+            stock_status=_stock_status(row.stock, row.quantity, row.is_active),
+        )
+        for row in rows if row.product_id is not None
+    ]
+    return CartView(
+        id=rows[0].id,
+        phone_number=rows[0].phone_number,
+        items=items,
+        item_count=sum(item.quantity for item in items),
+        total=round(sum(item.line_total for item in items), 2),
+    )
+
+
+async def _lock_cart_by_phone(db: AsyncSession, phone_number: str) -> Cart:
+    cart = await _lock_cart(db, Cart.phone_number == phone_number)
+    if not cart:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Cart not found for phone number {phone_number}"
+        )
+    return cart
+
+
+async def patch_items_by_phone(db: AsyncSession, phone_number: str, patch: CartItemsPatch) -> CartView:
+    """
+    Apply add/remove/set operations to the cart of a phone number in one transaction,
+    then return the enriched view of the cart.
+    """
+    cart = await _lock_cart_by_phone(db, phone_number)
+
+    quantities = {item.product_id: item.quantity for item in cart.cart_items}
+    if patch.replace:
+        mentioned = {item.product_id for item in patch.items}
+        quantities = {product_id: quantity for product_id, quantity in quantities.items() if product_id in mentioned}
+
+    for item in patch.items:
+        quantity = quantities.get(item.product_id, 0)
+        if item.op == "add":
+            quantity += item.quantity
+        elif item.op == "remove":
+            quantity = 0 if item.quantity is None else max(quantity - item.quantity, 0)
+        else:
+            quantity = item.quantity
+        quantities[item.product_id] = quantity
+
+    await _save_items(db, cart, {product_id: quantity for product_id, quantity in quantities.items() if quantity > 0})
+    return await get_cart_view_by_phone(db, phone_number)
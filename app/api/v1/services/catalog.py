@@ -0,0 +1,58 @@
+from datetime import datetime, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+
+from fastapi import Depends, HTTPException, Request, status
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from db.con import get_db
+from services.catalog_store import catalog_store, catalog_version_query
+
+
+async def get_catalog_state(db: AsyncSession) -> tuple[int, datetime]:
+    row = (await db.execute(catalog_version_query())).first()
+    if row is None or row.updated_at is None:
+        return 0, datetime.fromtimestamp(0, timezone.utc)
+    return row.version, row.updated_at
+
+
+def catalog_headers(version: int, updated_at: datetime) -> dict[str, str]:
+    # The timestamp keeps ETags unique when the catalog is rebuilt and the version starts over.
+    etag = f'"catalog-{version}-{int(updated_at.timestamp() * 1_000_000)}"'
+    return {
+        "ETag": etag,
+        "Last-Modified": format_datetime(updated_at.astimezone(timezone.utc), usegmt=True),
+        "Cache-Control": "no-cache",
+    }
+
+
+def _not_modified(request: Request, headers: dict[str, str], updated_at: datetime) -> bool:
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        tags = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+        return "*" in tags or headers["ETag"] in tags
+
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since:
+        try:
+            since = parsedate_to_datetime(if_modified_since)
+        except (TypeError, ValueError):
+            return False
+        # HTTP dates have one-second precision.
+        return updated_at.replace(microsecond=0) <= since
+    return False
+
+
+async def catalog_validators(request: Request, db: AsyncSession = Depends(get_db)) -> dict[str, str]:
+    """
+    Dependency for catalog reads: answers 304 Not Modified when the client's ETag or
+    Last-Modified is still current, otherwise returns the validator headers for the response.
+    While the in-memory catalog serves the read, its snapshot version is the one described.
+    """
+    if catalog_store.ready and catalog_store.updated_at is not None:
+        version, updated_at = catalog_store.version, catalog_store.updated_at
+    else:
+        version, updated_at = await get_catalog_state(db)
+    headers = catalog_headers(version, updated_at)
+    if _not_modified(request, headers, updated_at):
+        raise HTTPException(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    return headers
@@ -0,0 +1,505 @@
+import asyncio
+import json
+import logging
+import uuid
+from bisect import bisect_right, insort
+from collections import Counter
+from datetime import datetime
+from itertools import islice
+from typing import Callable, Iterable, Optional
+
+from sqlalchemy import Select, func, select
+from sqlalchemy.ext.asyncio import AsyncConnection, AsyncSession, create_async_engine
+from sqlalchemy.pool import NullPool
+
+from core.cache import catalog_cache, invalidate_products
+from core.settings import settings
+from db.con import SessionLocal
+from db.schemas import CatalogState, Category, Product
+from services.categories import CATEGORY_COLUMNS
+from services.products import normalize_color, normalize_size, product_row_dict, product_rows_query
+
+logger = logging.getLogger(__name__)
+
+CATALOG_CHANNEL = "catalog_changes"
+RECONNECT_SECONDS = 5.0
+# Idle LISTEN connections can die silently; a ping this often notices and reconnects.
+HEALTHCHECK_SECONDS = 30.0
+# How long a sync marker may take to come back on the LISTEN connection before reconnecting.
+SYNC_TIMEOUT_SECONDS = 10.0
+# Product fields that change without moving a product in or out of any cached list.
+STOCK_FIELDS = ("stock", "updated_at")
+
+
+def catalog_version_query() -> Select:
+    """Catalog version (sum of the counter slots) and time of the last change, in one snapshot."""
+    return select(
+        func.coalesce(func.sum(CatalogState.version), 0).label("version"),
+        func.max(CatalogState.updated_at).label("updated_at"),
+    )
+
+
+def _same_listing(old: Optional[dict], new: dict) -> bool:
+    """Whether two versions of a product differ at most in stock fields."""
+    if old is None:
+        return False
+    return all(old[field] == new[field] for field in new if field not in STOCK_FIELDS)
+
+
+# LISTEN needs its own long-lived connection, outside the request pool.
+listen_engine = create_async_engine(settings.database_url, poolclass=NullPool)
+
+
+class CatalogStore:
+    """
+    In-process copy of products and categories, indexed by id, category and is_active.
+
+    Loaded in full at startup, then refreshed row by row from the NOTIFY events the database
+    triggers send on commit, so every process converges on the committed catalog within
+    milliseconds. `version`/`updated_at` only advance to a catalog_state version once every
+    change it covers has been applied (see `_sync`), so a body is never older than the ETag
+    derived from them. Reads fall back to Postgres while `ready` is False (before the first
+    load or while the listener reconnects).
+
+    With `mirror=False` no copy is kept and the notifications only invalidate `catalog_cache`,
+    so cached agent reads still follow changes made by other processes and the ETL.
+    """
+
+    def __init__(self, debounce_seconds: float, mirror: bool = True):
+        self._debounce_seconds = debounce_seconds
+        self._mirror = mirror
+        self._reload_requested = False
+        self._products: dict[int, dict] = {}
+        self._categories: dict[int, dict] = {}
+        self._category_ids: list[int] = []
+        # Sorted product ids per filter combination, so pages are slices found with bisect.
+        self._index: dict[tuple, list[int]] = {}
+        self._pending_products: set[int] = set()
+        self._pending_categories: set[int] = set()
+        # Whether a pending product change is more than a stock update (see migration 0009).
+        self._pending_listing = False
+        self._changed: Optional[asyncio.Event] = None
+        self._sync_waiters: dict[str, asyncio.Future] = {}
+        # Row reads are numbered; one that started before the last applied read is stale.
+        self._fetches = 0
+        self._applied_fetch = 0
+        self._task: Optional[asyncio.Task] = None
+        self.version = 0
+        # Bumped whenever cached lists are dropped, i.e. on every change but stock updates.
+        self.content_version = 0
+        self.updated_at: Optional[datetime] = None
+        self.ready = False
+        self.notifications = 0
+        self.refreshes = 0
+        self.reloads = 0
+
+    # Reads
+
+    def list_products(
+        self,
+        skip: int = 0,
+        limit: int = 100,
+        category_id: Optional[int] = None,
+        is_active: Optional[bool] = None,
+        after_id: Optional[int] = None,
+        size: Optional[str] = None,
+        color: Optional[str] = None,
+        min_price: Optional[float] = None,
+        max_price: Optional[float] = None,
+    ) -> list[dict]:
+        ids = self._index.get(self._index_key(category_id, is_active), [])
+        start = bisect_right(ids, after_id) if after_id is not None else skip
+        matches = self._attribute_matcher(size, color, min_price, max_price)
+        if matches is None:
+            return [self._products[product_id] for product_id in ids[start:start + limit]]
+
+        # Attribute filters scan the indexed candidates in id order; `skip` counts matches.
+        offset = 0 if after_id is not None else skip
+        start = start if after_id is not None else 0
+        candidates = (self._products[product_id] for product_id in islice(ids, start, None))
+        return list(islice(filter(matches, candidates), offset, offset + limit))
+
+    def facets(
+        self,
+        category_id: Optional[int] = None,
+        is_active: Optional[bool] = None,
+        size: Optional[str] = None,
+        color: Optional[str] = None,
+        min_price: Optional[float] = None,
+        max_price: Optional[float] = None,
+    ) -> dict:
+        """Same counts as `services.products.get_product_facets`, in one pass over the copy."""
+        size = normalize_size(size) if size is not None else None
+        color = normalize_color(color) if color is not None else None
+        total, sizes, colors, categories, prices = 0, Counter(), Counter(), Counter(), []
+
+        for product in self._products.values():
+            price = product["price"]
+            failed = [name for name, passed in (
+                ("category_id", category_id is None or product["category_id"] == category_id),
+                ("is_active", is_active is None or product["is_active"] == is_active),
+                ("size", size is None or product["size"] == size),
+                ("color", color is None or product["color"] == color),
+                ("price", (min_price is None or (price is not None and price >= min_price))
+                    and (max_price is None or (price is not None and price <= max_price))),
+            ) if not passed]
+            # A facet counts the products that pass every filter except its own.
+            if not failed:
+                total += 1
+            if failed in ([], ["size"]) and product["size"] is not None:
+                sizes[product["size"]] += 1
+            if failed in ([], ["color"]) and product["color"] is not None:
+                colors[product["color"]] += 1
+            if failed in ([], ["category_id"]) and product["category_id"] in self._categories:
+                categories[product["category_id"]] += 1
+            if failed in ([], ["price"]) and price is not None:
+                prices.append(price)
+
+        return {
+            "total": total,
+            "sizes": [{"value": value, "count": count} for value, count in sorted(sizes.items())],
+            "colors": [{"value": value, "count": count} for value, count in sorted(colors.items())],
+            "categories": [
+                {"id": category_id, "name": self._categories[category_id]["name"], "count": count}
+                for category_id, count in sorted(categories.items())
+            ],
+            "price": {"min": min(prices, default=None), "max": max(prices, default=None)},
+        }
+
+    def get_product(self, product_id: int) -> Optional[dict]:
+        return self._products.get(product_id)
+
+    def get_products(self, product_ids: list[int]) -> tuple[list[dict], list[int]]:
+        products = [self._products[product_id] for product_id in product_ids if product_id in self._products]
+        missing = [product_id for product_id in product_ids if product_id not in self._products]
+        return products, missing
+
+    def list_categories(self, skip: int = 0, limit: int = 100, after_id: Optional[int] = None) -> list[dict]:
+        start = bisect_right(self._category_ids, after_id) if after_id is not None else skip
+        return [self._categories[category_id] for category_id in self._category_ids[start:start + limit]]
+
+    def get_category(self, category_id: int) -> Optional[dict]:
+        return self._categories.get(category_id)
+
+    def stats(self) -> dict:
+        return {
+            "ready": self.ready,
+            "version": self.version,
+            "products": len(self._products),
+            "categories": len(self._categories),
+            "notifications": self.notifications,
+            "refreshes": self.refreshes,
+            "reloads": self.reloads,
+        }
+
+    # Indexes
+
+    @staticmethod
+    def _attribute_matcher(
+        size: Optional[str],
+        color: Optional[str],
+        min_price: Optional[float],
+        max_price: Optional[float],
+    ) -> Optional[Callable[[dict], bool]]:
+        """Predicate for the filters that have no index of their own, or None when none is set."""
+        if size is None and color is None and min_price is None and max_price is None:
+            return None
+        size = normalize_size(size) if size is not None else None
+        color = normalize_color(color) if color is not None else None
+
+        def matches(product: dict) -> bool:
+            price = product["price"]
+            return (
+                (size is None or product["size"] == size)
+                and (color is None or product["color"] == color)
+                and (min_price is None or (price is not None and price >= min_price))
+                and (max_price is None or (price is not None and price <= max_price))
+            )
+
+        return matches
+
+    @staticmethod
+    def _index_key(category_id: Optional[int], is_active: Optional[bool]) -> tuple:
+        if category_id is None and is_active is None:
+            return ("all",)
+        if is_active is None:
+            return ("category", category_id)
+        if category_id is None:
+            return ("active", is_active)
+        return ("category_active", category_id, is_active)
+
+    def _keys(self, product: dict) -> list[tuple]:
+        category_id, is_active = product["category_id"], product["is_active"]
+        return [
+            ("all",),
+            ("category", category_id),
+            ("active", is_active),
+            ("category_active", category_id, is_active),
+        ]
+
+    def _put_product(self, product: dict) -> None:
+        self._drop_product(product["id"])
+        self._products[product["id"]] = product
+        for key in self._keys(product):
+            insort(self._index.setdefault(key, []), product["id"])
+
+    def _drop_product(self, product_id: int) -> None:
+        product = self._products.pop(product_id, None)
+        if product is None:
+            return
+        for key in self._keys(product):
+            self._index[key].remove(product_id)
+
+    def _put_category(self, category: dict) -> None:
+        if category["id"] not in self._categories:
+            insort(self._category_ids, category["id"])
+        self._categories[category["id"]] = category
+        # Products embed their category's id and name.
+        for product_id in self._index.get(("category", category["id"]), []):
+            self._products[product_id] = {
+                **self._products[product_id], "category": {"id": category["id"], "name": category["name"]}
+            }
+
+    def _drop_category(self, category_id: int) -> None:
+        if self._categories.pop(category_id, None) is not None:
+            self._category_ids.remove(category_id)
+
+    # Loading
+
+    async def _fetch(
+        self,
+        product_ids: Optional[Iterable[int]] = None,
+        category_ids: Optional[Iterable[int]] = None,
+    ) -> tuple:
+        """Read the given rows. None fetches every row of a table."""
+        async with SessionLocal() as db:
+            categories = []
+            if category_ids is None or category_ids:
+                query = select(*CATEGORY_COLUMNS)
+                if category_ids is not None:
+                    query = query.where(Category.id.in_(category_ids))
+                categories = [dict(row._mapping) for row in await db.execute(query)]
+
+            products = []
+            if product_ids is None or product_ids:
+                query = product_rows_query()
+                if product_ids is not None:
+                    query = query.where(Product.id.in_(product_ids))
+                products = [product_row_dict(row) for row in await db.execute(query)]
+
+        return categories, products
+
+    async def _sync(self, connection: AsyncConnection) -> tuple[int, Optional[datetime]]:
+        """
+        Read the catalog version and wait until every notification it covers was received.
+
+        The version is read and a marker notified in one transaction on the LISTEN connection.
+        Changes visible to that read committed before it, so their notifications are queued
+        before the marker and delivered before it comes back; after that they are all pending.
+        """
+        token = uuid.uuid4().hex
+        marker = asyncio.get_running_loop().create_future()
+        self._sync_waiters[token] = marker
+        try:
+            async with connection.begin():
+                state = (await connection.execute(catalog_version_query())).first()
+                await connection.execute(select(func.pg_notify(CATALOG_CHANNEL, json.dumps({"sync": token}))))
+            await asyncio.wait_for(marker, SYNC_TIMEOUT_SECONDS)
+        finally:
+            self._sync_waiters.pop(token, None)
+        return (state.version, state.updated_at) if state.updated_at else (0, None)
+
+    def _take_pending(self) -> tuple[set[int], set[int]]:
+        product_ids, self._pending_products = self._pending_products, set()
+        category_ids, self._pending_categories = self._pending_categories, set()
+        self._pending_listing = False
+        return product_ids, category_ids
+
+    async def reload(self, connection: AsyncConnection) -> None:
+        self.reloads += 1
+        if not self._mirror:
+            self._take_pending()
+            self._invalidate_lists()
+            return
+
+        version, updated_at = await self._sync(connection)
+        # Rows are read after this point, so they include every change notified so far.
+        self._take_pending()
+        self._fetches += 1
+        fetch = self._fetches
+        categories, products = await self._fetch()
+        self._products, self._categories, self._category_ids, self._index = {}, {}, [], {}
+        for category in categories:
+            self._put_category(category)
+        for product in products:
+            self._put_product(product)
+        self.version, self.updated_at = version, updated_at
+        self._applied_fetch = fetch
+        self.ready = True
+        self._invalidate_lists()
+        logger.info(f"Catalog store loaded {len(products)} products, {len(categories)} categories (v{version})")
+
+    async def refresh(self, connection: AsyncConnection) -> None:
+        """Apply every pending notification, then advance to the version they bring the copy to."""
+        if not self._mirror:
+            listing_changed = self._pending_listing
+            product_ids, category_ids = self._take_pending()
+            invalidate_products(product_ids)
+            if category_ids or listing_changed:
+                self._invalidate_lists()
+            return
+
+        version, updated_at = await self._sync(connection)
+        if await self._refresh_rows(*self._take_pending()):
+            self.version, self.updated_at = version, updated_at
+
+    async def _refresh_rows(self, product_ids: Iterable[int] = (), category_ids: Iterable[int] = ()) -> bool:
+        """
+        Re-read the given rows. The version is left alone: other changes may still be pending.
+        Returns False when the rows were queued again instead, because a read that started
+        later was applied while this one was in flight.
+        """
+        product_ids, category_ids = set(product_ids), set(category_ids)
+        if not self.ready:
+            return False
+        if not (product_ids or category_ids):
+            return True
+
+        self._fetches += 1
+        fetch = self._fetches
+        categories, products = await self._fetch(product_ids, category_ids)
+        if fetch < self._applied_fetch:
+            self._queue(product_ids, category_ids)
+            return False
+
+        for category in categories:
+            self._put_category(category)
+        for category_id in category_ids - {category["id"] for category in categories}:
+            self._drop_category(category_id)
+        listing_changed = False
+        for product in products:
+            listing_changed = listing_changed or not _same_listing(self._products.get(product["id"]), product)
+            self._put_product(product)
+        for product_id in product_ids - {product["id"] for product in products}:
+            listing_changed = listing_changed or product_id in self._products
+            self._drop_product(product_id)
+        self._applied_fetch = fetch
+        self.refreshes += 1
+
+        # Cached lists are only tagged with the products they contain, so a product that
+        # appears, is activated, moves category or changes price or attributes drops them all.
+        invalidate_products(product_ids)
+        if category_ids or listing_changed:
+            self._invalidate_lists()
+        return True
+
+    async def read_own_writes(self, product_ids: Iterable[int]) -> None:
+        """
+        Refresh rows this process just committed, so its next read sees them without waiting
+        for the notification. The version, and so the ETag, catches up with the next `refresh`.
+        Failures are only logged: the NOTIFY refresh follows anyway.
+        """
+        try:
+            await self._refresh_rows(product_ids)
+        except Exception as e:
+            logger.warning(f"Could not refresh catalog store after a local write: {e}")
+
+    def _invalidate_lists(self) -> None:
+        self.content_version += 1
+        catalog_cache.invalidate("catalog")
+
+    # Listening
+
+    def _queue(self, product_ids: Iterable[int], category_ids: Iterable[int]) -> None:
+        self._pending_products.update(product_ids)
+        self._pending_categories.update(category_ids)
+        if self._changed is not None:
+            self._changed.set()
+
+    def _on_notify(self, connection, pid: int, channel: str, payload: str) -> None:
+        try:
+            change = json.loads(payload)
+        except ValueError:
+            logger.warning(f"Ignoring malformed catalog notification: {payload}")
+            return
+        if "sync" in change:
+            # Sync markers of other processes arrive here too.
+            marker = self._sync_waiters.get(change["sync"])
+            if marker is not None and not marker.done():
+                marker.set_result(None)
+            return
+
+        self.notifications += 1
+        if change.get("reload"):
+            self._reload_requested = True
+            if self._changed is not None:
+                self._changed.set()
+        elif change.get("table") == "categories":
+            self._queue((), (change["id"],))
+        else:
+            # Notifications sent before migration 0009 carry no flag; treat them as listing changes.
+            self._pending_listing = self._pending_listing or not change.get("stock_only", False)
+            self._queue((change["id"],), ())
+
+    async def _listen(self) -> None:
+        async with listen_engine.connect() as connection:
+            driver = (await connection.get_raw_connection()).driver_connection
+            closed = asyncio.Event()
+            driver.add_termination_listener(lambda _connection: closed.set())
+            # Listen before loading, so no change committed in between is missed.
+            await driver.add_listener(CATALOG_CHANNEL, self._on_notify)
+            await self.reload(connection)
+
+            while not closed.is_set():
+                try:
+                    await asyncio.wait_for(self._changed.wait(), HEALTHCHECK_SECONDS)
+                except asyncio.TimeoutError:
+                    await driver.execute("SELECT 1")
+                    continue
+                # Coalesce bursts (an ETL load, a multi-item cart write) into one refresh.
+                await asyncio.sleep(self._debounce_seconds)
+                self._changed.clear()
+                if self._reload_requested:
+                    self._reload_requested = False
+                    await self.reload(connection)
+                else:
+                    await self.refresh(connection)
+            raise ConnectionError("Catalog LISTEN connection closed")
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await self._listen()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Catalog store listener failed, serving catalog from Postgres: {e}")
+            # Without notifications the copy may go stale; read through to Postgres until reloaded.
+            self.ready = False
+            await asyncio.sleep(RECONNECT_SECONDS)
+
+    async def start(self) -> None:
+        if self._task is not None:
+            return
+        self._changed = asyncio.Event()
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is None:
+            return
+        self._task.cancel()
+        await asyncio.gather(self._task, return_exceptions=True)
+        self._task = None
+        self.ready = False
+
+
+async def notify_catalog_reload(db: AsyncSession) -> None:
+    """Make every listening process reload its catalog and drop cached reads, e.g. after a bulk load."""
+    await db.execute(select(func.pg_notify(CATALOG_CHANNEL, json.dumps({"reload": True}))))
+    await db.commit()
+
+
+catalog_store = CatalogStore(
+    debounce_seconds=settings.catalog_store_debounce_seconds,
+    mirror=settings.catalog_store_enabled,
+)
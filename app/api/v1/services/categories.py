@@ -0,0 +1,56 @@
+import orjson
+from fastapi import HTTPException, status
+from sqlalchemy import Select, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import Optional
+
+from db.schemas import Category
+from models.categories import CategoryResponse
+
+CATEGORY_COLUMNS = tuple(getattr(Category, field) for field in CategoryResponse.model_fields)
+
+
+async def list_categories(
+    db: AsyncSession,
+    skip: int = 0,
+    limit: int = 100,
+    after_id: Optional[int] = None,
+) -> list[Category]:
+    """List categories ordered by id. `after_id` pages by key (id > after_id) instead of by offset."""
+    result = await db.execute(_page_categories(select(Category), skip, limit, after_id))
+    return list(result.scalars().all())
+
+
+def _page_categories(query: Select, skip: int, limit: int, after_id: Optional[int]) -> Select:
+    if after_id is not None:
+        query = query.where(Category.id > after_id)
+    else:
+        query = query.offset(skip)
+    return query.order_by(Category.id).limit(limit)
+
+
+async def list_category_rows(
+    db: AsyncSession,
+    skip: int = 0,
+    limit: int = 100,
+    after_id: Optional[int] = None,
+) -> list:
+    """Fast path of `list_categories` for JSON responses: plain rows instead of ORM objects."""
+    return list((await db.execute(_page_categories(select(*CATEGORY_COLUMNS), skip, limit, after_id))).all())
+
+
+def encode_category_rows(rows: list) -> bytes:
+    """Encode rows from `list_category_rows` to the JSON of a `List[CategoryResponse]`."""
+    return orjson.dumps([dict(row._mapping) for row in rows])
+
+
+async def get_category(db: AsyncSession, category_id: int) -> Category:
+    category = await db.get(Category, category_id)
+
+    if not category:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Category with id {category_id} not found"
+        )
+
+    return category
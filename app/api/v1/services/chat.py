@@ -0,0 +1,92 @@
+import logging
+import time
+import traceback
+
+from agent.chunking import split_message
+from agent.main import run_sales_agent, stream_sales_agent
+from db.con import SessionLocal
+from db.locks import conversation_lock
+from core.metrics import stage_latencies
+from core.settings import settings
+from services.whatsapp import whatsapp_sender
+
+logger = logging.getLogger(__name__)
+
+ERROR_REPLY = "Lo siento, hubo un error procesando tu mensaje. Intenta de nuevo."
+
+
+def send_whatsapp_message(phone_number: str, body: str) -> None:
+    """Queue a reply for delivery; never waits on Twilio."""
+    whatsapp_sender.send(phone_number, body)
+
+
+def send_error_reply(phone_number: str) -> None:
+    try:
+        send_whatsapp_message(phone_number, ERROR_REPLY)
+    except Exception as send_error:
+        logger.error(f"Error sending error message: {send_error}")
+
+
+async def answer_message(phone_number: str, message: str) -> None:
+    """
+    Run one agent turn for `message` and send the reply. Errors propagate to the caller,
+    except those raised after part of a streamed reply was sent: the turn is not repeatable
+    then, so they are logged and answered with the error reply here.
+    
+    The turn holds the phone's conversation lock, so concurrent turns for the same customer
+    from other workers, processes or hosts wait instead of racing on history and cart.
+    """
+    async with conversation_lock(phone_number):
+        await _answer_message(phone_number, message)
+
+
+async def _answer_message(phone_number: str, message: str) -> None:
+    started = time.perf_counter()
+    try:
+        async with SessionLocal() as db:
+            if settings.agent_streaming:
+                first_chunk = True
+                try:
+                    async for chunk in stream_sales_agent(
+                        user_message=message,
+                        user_phone=phone_number,
+                        db_session=db
+                    ):
+                        if first_chunk:
+                            stage_latencies.record("agent_first_chunk", time.perf_counter() - started)
+                            first_chunk = False
+                        logger.info(f"Sending response chunk to {phone_number}: {chunk[:100]}...")
+                        send_whatsapp_message(phone_number, chunk)
+                except Exception as e:
+                    if first_chunk:
+                        raise
+                    # Part of the reply is already out; a retry would send it again. End the
+                    # turn here so the caller does not retry it, and tell the customer.
+                    logger.error(f"Error after streaming part of the reply to {phone_number}: {e}")
+                    logger.error(traceback.format_exc())
+                    send_error_reply(phone_number)
+                return
+            
+            with stage_latencies.timer("agent"):
+                agent_response = await run_sales_agent(
+                    user_message=message,
+                    user_phone=phone_number,
+                    db_session=db
+                )
+        
+        response_text = agent_response.response
+        logger.info(f"Sending response to {phone_number}: {response_text[:100]}...")
+        
+        for chunk in split_message(response_text, settings.whatsapp_max_chars):
+            send_whatsapp_message(phone_number, chunk)
+    finally:
+        stage_latencies.record("turn", time.perf_counter() - started)
+
+
+async def process_and_send_message(phone_number: str, message: str):
+    try:
+        await answer_message(phone_number, message)
+    except Exception as e:
+        logger.error(f"Error processing message: {e}")
+        logger.error(traceback.format_exc())
+        send_error_reply(phone_number)
@@ -0,0 +1,339 @@
+import re
+
+import orjson
+from fastapi import HTTPException, status
+from pydantic_core import to_jsonable_python
+from sqlalchemy import Select, cast, func, literal, or_, select
+from sqlalchemy.dialects.postgresql import REGCONFIG
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import joinedload
+from typing import Optional
+
+from db.schemas import Category, Product
+from models.products import CategoryBase, ProductFacets, ProductResponse
+
+MAX_BATCH_IDS = 100
+SEARCH_CONFIG = "spanish"
+# Longer queries only add noise to the ranking and cost to the trigram match.
+MAX_SEARCH_TERMS = 10
+# ProductResponse fields that are plain products columns.
+PRODUCT_COLUMNS = tuple(field for field in ProductResponse.model_fields if field != "category")
+
+
+def parse_fields(fields: Optional[str]) -> Optional[set[str]]:
+    """Parse a comma separated `fields=` projection, rejecting unknown product fields."""
+    if not fields:
+        return None
+
+    requested = {field.strip() for field in fields.split(",") if field.strip()}
+    unknown = sorted(requested - set(ProductResponse.model_fields))
+    if unknown:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Unknown product fields: {', '.join(unknown)}. Allowed: {', '.join(ProductResponse.model_fields)}"
+        )
+
+    return requested
+
+
+def parse_ids(ids: str) -> list[int]:
+    """Parse a comma separated `ids=` list, keeping the first occurrence of each id."""
+    try:
+        parsed = [int(product_id) for product_id in ids.split(",") if product_id.strip()]
+    except ValueError:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="ids must be a comma separated list of integers"
+        )
+
+    parsed = list(dict.fromkeys(parsed))
+    if not parsed or len(parsed) > MAX_BATCH_IDS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"ids must list between 1 and {MAX_BATCH_IDS} products"
+        )
+
+    return parsed
+
+
+def normalize_size(size: str) -> str:
+    """Sizes are stored upper case ("M", "XXL"), so filters match whatever case was asked for."""
+    return size.strip().upper()
+
+
+def normalize_color(color: str) -> str:
+    """Colors are stored with capitalized words ("Negro", "Azul Marino")."""
+    return color.strip().title()
+
+
+def project_product(product: Product, fields: set[str]) -> dict:
+    """Serialize only the requested fields, without touching relationships that were not asked for."""
+    projected = {}
+    for field in ProductResponse.model_fields:
+        if field not in fields:
+            continue
+        value = getattr(product, field)
+        if field == "category" and value is not None:
+            value = CategoryBase.model_validate(value)
+        projected[field] = value
+    return to_jsonable_python(projected)
+
+
+async def list_products(
+    db: AsyncSession,
+    skip: int = 0,
+    limit: int = 100,
+    category_id: Optional[int] = None,
+    is_active: Optional[bool] = None,
+    with_category: bool = True,
+    after_id: Optional[int] = None,
+    size: Optional[str] = None,
+    color: Optional[str] = None,
+    min_price: Optional[float] = None,
+    max_price: Optional[float] = None,
+) -> list[Product]:
+    """List products ordered by id. `after_id` pages by key (id > after_id) instead of by offset."""
+    query = select(Product)
+    if with_category:
+        query = query.options(joinedload(Product.category))
+
+    query = _filter_products(query, category_id, is_active, size, color, min_price, max_price)
+    query = _page_products(query, skip, limit, after_id)
+    result = await db.execute(query)
+    return list(result.scalars().all())
+
+
+def _filter_products(
+    query: Select,
+    category_id: Optional[int] = None,
+    is_active: Optional[bool] = None,
+    size: Optional[str] = None,
+    color: Optional[str] = None,
+    min_price: Optional[float] = None,
+    max_price: Optional[float] = None,
+) -> Select:
+    if category_id is not None:
+        query = query.where(Product.category_id == category_id)
+
+    if is_active is not None:
+        query = query.where(Product.is_active == is_active)
+
+    if size is not None:
+        query = query.where(Product.size == normalize_size(size))
+
+    if color is not None:
+        query = query.where(Product.color == normalize_color(color))
+
+    if min_price is not None:
+        query = query.where(Product.price >= min_price)
+
+    if max_price is not None:
+        query = query.where(Product.price <= max_price)
+
+    return query
+
+
+def _page_products(query: Select, skip: int, limit: int, after_id: Optional[int]) -> Select:
+    if after_id is not None:
+        query = query.where(Product.id > after_id)
+    else:
+        query = query.offset(skip)
+
+    return query.order_by(Product.id).limit(limit)
+
+
+async def list_product_rows(
+    db: AsyncSession,
+    skip: int = 0,
+    limit: int = 100,
+    category_id: Optional[int] = None,
+    is_active: Optional[bool] = None,
+    after_id: Optional[int] = None,
+    fields: Optional[set[str]] = None,
+    size: Optional[str] = None,
+    color: Optional[str] = None,
+    min_price: Optional[float] = None,
+    max_price: Optional[float] = None,
+) -> list:
+    """
+    Fast path of `list_products` for JSON responses: selects only the requested columns as
+    plain rows (the category as two joined columns), skipping ORM objects entirely.
+    """
+    query = _filter_products(product_rows_query(fields), category_id, is_active, size, color, min_price, max_price)
+    query = _page_products(query, skip, limit, after_id)
+    return list((await db.execute(query)).all())
+
+
+def product_rows_query(fields: Optional[set[str]] = None) -> Select:
+    """Select the products columns behind `fields` (always including id), with the category joined in."""
+    fields = fields or set(ProductResponse.model_fields)
+    columns = [Product.id] + [
+        getattr(Product, field) for field in PRODUCT_COLUMNS if field in fields and field != "id"
+    ]
+    query = select(*columns)
+    if "category" in fields:
+        query = query.add_columns(
+            Category.id.label("category__id"), Category.name.label("category__name")
+        ).outerjoin(Category, Category.id == Product.category_id)
+    return query
+
+
+def product_row_dict(row, fields: Optional[set[str]] = None) -> dict:
+    """Turn a row of `product_rows_query` into a ProductResponse-shaped dict."""
+    values = row._mapping
+    product = {}
+    for name in ProductResponse.model_fields:
+        if fields is not None and name not in fields:
+            continue
+        if name == "category":
+            category_id = values["category__id"]
+            product[name] = None if category_id is None else {"id": category_id, "name": values["category__name"]}
+        else:
+            product[name] = values[name]
+    return product
+
+
+def encode_product_rows(rows: list, fields: Optional[set[str]] = None) -> bytes:
+    """Encode rows from `list_product_rows` to the JSON of a `List[ProductResponse]`."""
+    return orjson.dumps([product_row_dict(row, fields) for row in rows])
+
+
+def select_fields(product: dict, fields: Optional[set[str]] = None) -> dict:
+    """Keep only `fields` of a ProductResponse-shaped dict."""
+    if fields is None:
+        return product
+    return {name: value for name, value in product.items() if name in fields}
+
+
+def encode_products(products: list[dict], fields: Optional[set[str]] = None) -> bytes:
+    """Encode ProductResponse-shaped dicts, keeping only `fields`."""
+    return orjson.dumps([select_fields(product, fields) for product in products])
+
+
+async def get_product(db: AsyncSession, product_id: int, with_category: bool = True) -> Product:
+    query = select(Product).where(Product.id == product_id)
+    if with_category:
+        query = query.options(joinedload(Product.category))
+
+    product = (await db.execute(query)).scalars().first()
+
+    if not product:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail=f"Product with id {product_id} not found"
+        )
+
+    return product
+
+
+async def get_products_by_ids(
+    db: AsyncSession,
+    product_ids: list[int],
+    with_category: bool = True,
+) -> tuple[list[Product], list[int]]:
+    """Fetch several products with one IN query. Returns them in request order plus the missing ids."""
+    query = select(Product).where(Product.id.in_(product_ids))
+    if with_category:
+        query = query.options(joinedload(Product.category))
+
+    found = {product.id: product for product in (await db.execute(query)).scalars()}
+    products = [found[product_id] for product_id in product_ids if product_id in found]
+    missing = [product_id for product_id in product_ids if product_id not in found]
+    return products, missing
+
+
+def _search_terms(q: str) -> list[str]:
+    terms = list(dict.fromkeys(re.findall(r"\w+", q.lower())))[:MAX_SEARCH_TERMS]
+    if not terms:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="q must contain at least one word"
+        )
+    return terms
+
+
+async def search_product_rows(
+    db: AsyncSession,
+    q: str,
+    skip: int = 0,
+    limit: int = 20,
+    category_id: Optional[int] = None,
+    is_active: Optional[bool] = None,
+    fields: Optional[set[str]] = None,
+    size: Optional[str] = None,
+    color: Optional[str] = None,
+    min_price: Optional[float] = None,
+    max_price: Optional[float] = None,
+) -> list:
+    """
+    Rank products against a free-text query, best match first.
+
+    A product matches when its Spanish full-text document contains any query word (stemmed,
+    so "camperas negras" finds a "Campera" in color "Negro"), or when the query is close to its
+    name or description by trigram word similarity (typos). Products matching more words, or
+    matching them in the name, rank higher. Attribute filters narrow the matches. Rows have the
+    shape of `list_product_rows`.
+    """
+    terms = _search_terms(q)
+    text = " ".join(terms)
+    tsquery = func.to_tsquery(cast(SEARCH_CONFIG, REGCONFIG), " | ".join(terms))
+    score = func.ts_rank_cd(Product.search_vector, tsquery) + func.word_similarity(text, Product.name)
+
+    query = product_rows_query(fields).where(or_(
+        Product.search_vector.op("@@")(tsquery),
+        literal(text).op("<%")(Product.name),
+        literal(text).op("<%")(Product.description),
+    ))
+    query = _filter_products(query, category_id, is_active, size, color, min_price, max_price)
+    query = query.order_by(score.desc(), Product.id).offset(skip).limit(limit)
+    return list((await db.execute(query)).all())
+
+
+async def get_product_facets(
+    db: AsyncSession,
+    category_id: Optional[int] = None,
+    is_active: Optional[bool] = None,
+    size: Optional[str] = None,
+    color: Optional[str] = None,
+    min_price: Optional[float] = None,
+    max_price: Optional[float] = None,
+) -> ProductFacets:
+    """
+    Count products per size, color and category, and the price range, under the given filters.
+
+    Each facet is counted without its own filter, so with `size=M` the sizes still list every
+    size the other filters allow, each with the count selecting it would give.
+    """
+    filters = {
+        "category_id": category_id, "is_active": is_active, "size": size,
+        "color": color, "min_price": min_price, "max_price": max_price,
+    }
+
+    def filtered(query: Select, *ignored: str) -> Select:
+        return _filter_products(query, **{name: value for name, value in filters.items() if name not in ignored})
+
+    total = await db.scalar(filtered(select(func.count(Product.id))))
+
+    sizes = await db.execute(
+        filtered(select(Product.size, func.count(Product.id)), "size")
+        .where(Product.size.is_not(None)).group_by(Product.size).order_by(Product.size)
+    )
+    colors = await db.execute(
+        filtered(select(Product.color, func.count(Product.id)), "color")
+        .where(Product.color.is_not(None)).group_by(Product.color).order_by(Product.color)
+    )
+    categories = await db.execute(
+        filtered(select(Category.id, Category.name, func.count(Product.id)).select_from(Product), "category_id")
+        .join(Category, Category.id == Product.category_id).group_by(Category.id).order_by(Category.id)
+    )
+    price = (await db.execute(
+        filtered(select(func.min(Product.price), func.max(Product.price)), "min_price", "max_price")
+    )).one()
+
+    return ProductFacets(
+        total=total,
+        sizes=[{"value": value, "count": count} for value, count in sizes],
+        colors=[{"value": value, "count": count} for value, count in colors],
+        categories=[{"id": category_id, "name": name, "count": count} for category_id, name, count in categories],
+        price={"min": price[0], "max": price[1]},
+    )
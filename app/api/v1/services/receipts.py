@@ -0,0 +1,56 @@
+import threading
+from collections import OrderedDict
+from datetime import timedelta
+from sqlalchemy import delete, func
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from core.settings import settings
+from db.schemas.message_receipts import MessageReceipt
+
+
+class RecentMessageIds:
+    """Bounded in-memory set of recently accepted Twilio MessageSids, checked before the database."""
+
+    def __init__(self, maxsize: int):
+        self._maxsize = maxsize
+        self._ids: OrderedDict[str, None] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __contains__(self, message_sid: str) -> bool:
+        with self._lock:
+            return message_sid in self._ids
+
+    def add(self, message_sid: str) -> None:
+        with self._lock:
+            self._ids[message_sid] = None
+            self._ids.move_to_end(message_sid)
+            while len(self._ids) > self._maxsize:
+                self._ids.popitem(last=False)
+
+
+recent_message_ids = RecentMessageIds(settings.webhook_dedupe_cache_size)
+
+
+async def record_receipt(db: AsyncSession, message_sid: str, phone_number: str) -> bool:
+    """
+    Record a MessageSid. Returns False if it was already recorded (a Twilio retry).
+    Does not commit, so the receipt can share a transaction with the work it guards.
+    """
+    inserted = (await db.execute(
+        insert(MessageReceipt)
+        .values(message_sid=message_sid, phone_number=phone_number)
+        .on_conflict_do_nothing(index_elements=[MessageReceipt.message_sid])
+        .returning(MessageReceipt.message_sid)
+    )).first()
+    return inserted is not None
+
+
+async def purge_receipts(db: AsyncSession, older_than_hours: float) -> int:
+    result = await db.execute(
+        delete(MessageReceipt)
+        .where(MessageReceipt.received_at < func.now() - timedelta(hours=older_than_hours))
+        .execution_options(synchronize_session=False)
+    )
+    await db.commit()
+    return result.rowcount
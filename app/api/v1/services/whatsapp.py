@@ -0,0 +1,155 @@
+import asyncio
+import logging
+import time
+import zlib
+from collections import deque
+from typing import Deque, List, Optional, Tuple
+
+import httpx
+
+from core.metrics import stage_latencies
+from core.settings import settings
+
+logger = logging.getLogger(__name__)
+
+TWILIO_MESSAGES_URL = "https://api.twilio.com/2010-04-01/Accounts/{account_sid}/Messages.json"
+RETRYABLE_STATUS = {429, 500, 502, 503, 504}
+
+
+class TwilioSender:
+    """
+    Delivers WhatsApp messages through the Twilio REST API from background workers.
+
+    `send` only enqueues, so callers never wait on Twilio. Each phone number is pinned to one
+    worker queue, which keeps a reply's messages in order while at most `concurrency` requests
+    are in flight. 429 and 5xx responses are retried with exponential backoff.
+    """
+
+    def __init__(self, concurrency: int, max_retries: int, backoff_seconds: float):
+        self._concurrency = concurrency
+        self._max_retries = max_retries
+        self._backoff_seconds = backoff_seconds
+        self._queues: List[asyncio.Queue] = []
+        self._workers: List[asyncio.Task] = []
+        self._client: Optional[httpx.AsyncClient] = None
+        self.delivered = 0
+        self.failed = 0
+        self.retried = 0
+
+    def _ensure_started(self) -> None:
+        if self._workers:
+            return
+        self._client = httpx.AsyncClient(
+            auth=(settings.twilio_account_sid, settings.twilio_auth_token),
+            timeout=httpx.Timeout(10.0),
+            limits=httpx.Limits(max_connections=self._concurrency, max_keepalive_connections=self._concurrency),
+        )
+        self._queues = [asyncio.Queue() for _ in range(self._concurrency)]
+        self._workers = [asyncio.create_task(self._work(queue)) for queue in self._queues]
+
+    async def start(self) -> None:
+        self._ensure_started()
+
+    def send(self, phone_number: str, body: str) -> None:
+        self._ensure_started()
+        shard = zlib.crc32(phone_number.encode()) % self._concurrency
+        self._queues[shard].put_nowait((phone_number, body, time.perf_counter()))
+
+    async def _work(self, queue: asyncio.Queue) -> None:
+        while True:
+            phone_number, body, enqueued_at = await queue.get()
+            try:
+                await self._deliver(phone_number, body)
+                stage_latencies.record("whatsapp_delivery", time.perf_counter() - enqueued_at)
+            except Exception as e:
+                self.failed += 1
+                logger.error(f"Error sending WhatsApp message to {phone_number}: {e}")
+            finally:
+                queue.task_done()
+
+    async def _deliver(self, phone_number: str, body: str) -> None:
+        url = TWILIO_MESSAGES_URL.format(account_sid=settings.twilio_account_sid)
+        data = {
+            "From": f"whatsapp:{settings.twilio_phone_number}",
+            "To": f"whatsapp:{phone_number}",
+            "Body": body,
+        }
+        for attempt in range(self._max_retries + 1):
+            try:
+                response = await self._client.post(url, data=data)
+            except httpx.TransportError:
+                if attempt == self._max_retries:
+                    raise
+                response = None
+
+            if response is not None and response.status_code not in RETRYABLE_STATUS:
+                response.raise_for_status()
+                self.delivered += 1
+                return
+            if attempt == self._max_retries:
+                response.raise_for_status()
+
+            self.retried += 1
+            await asyncio.sleep(self._retry_delay(response, attempt))
+
+    def _retry_delay(self, response: Optional[httpx.Response], attempt: int) -> float:
+        retry_after = response.headers.get("Retry-After") if response is not None else None
+        if retry_after and retry_after.isdigit():
+            return float(retry_after)
+        return min(self._backoff_seconds * 2 ** attempt, 30.0)
+
+    def stats(self) -> dict:
+        return {
+            "queued": sum(queue.qsize() for queue in self._queues),
+            "delivered": self.delivered,
+            "failed": self.failed,
+            "retried": self.retried,
+        }
+
+    async def stop(self, timeout: float = 10.0) -> None:
+        """Flush queued messages (up to `timeout` seconds) and close the HTTP client."""
+        if not self._workers:
+            return
+        try:
+            await asyncio.wait_for(asyncio.gather(*(queue.join() for queue in self._queues)), timeout)
+        except asyncio.TimeoutError:
+            logger.warning(f"Dropping {self.stats()['queued']} unsent WhatsApp messages on shutdown")
+        for worker in self._workers:
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+        await self._client.aclose()
+
+
+class FakeSender:
+    """Keeps the most recent outbound messages in memory instead of delivering them."""
+
+    def __init__(self, maxlen: int = 10000):
+        self.sent: Deque[Tuple[float, str, str]] = deque(maxlen=maxlen)
+        self.total = 0
+
+    async def start(self) -> None:
+        pass
+
+    def send(self, phone_number: str, body: str) -> None:
+        self.sent.append((time.monotonic(), phone_number, body))
+        self.total += 1
+
+    def stats(self) -> dict:
+        return {"queued": 0, "delivered": self.total, "failed": 0, "retried": 0}
+
+    async def stop(self, timeout: float = 10.0) -> None:
+        pass
+
+
+def build_sender():
+    if settings.whatsapp_sender == "fake":
+        return FakeSender()
+    return TwilioSender(
+        concurrency=settings.whatsapp_send_concurrency,
+        max_retries=settings.whatsapp_send_max_retries,
+        backoff_seconds=settings.whatsapp_send_backoff_seconds,
+    )
+
+
+whatsapp_sender = build_sender()